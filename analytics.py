@@ -0,0 +1,181 @@
+"""
+Cohort Analytics
+Department-wide reports over marks and semester summaries.
+
+Reports never load mark rows into Python. The database groups the rows into
+a value histogram per group - (group, value, how many rows, how many passed) -
+which is a few hundred rows for the whole department because internals take
+few distinct values. Mean, median, standard deviation and pass rate are then
+computed exactly from those counts. A covering index on marks (semester,
+subject_code, internal_1, internal_2) lets the per-subject histogram be built
+from the index alone.
+"""
+
+import math
+import os
+from itertools import groupby
+
+from sqlalchemy import select, func, case, and_
+
+from models import Student, Mark, SemesterSummary
+
+# A subject is passed when the best of the two internals reaches this mark
+PASS_MARK = float(os.getenv("PASS_MARK", "20"))
+DEFAULT_TOPPERS_LIMIT = 10
+
+def _histogram(source, group_names):
+    """
+    Group source rows by (groups..., value), counting rows and passes.
+
+    source must be a subquery exposing the group columns, a `value` column and
+    a `passed` column that is 1 or 0.
+    """
+    keys = [source.c[name] for name in group_names] + [source.c.value]
+    return (
+        select(*keys, func.count().label("rows"), func.sum(source.c.passed).label("passed"))
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+
+def _distribution(buckets) -> dict:
+    """Exact statistics from (value, rows, passed) buckets sorted by value"""
+    count = sum(bucket.rows for bucket in buckets)
+    mean = sum(bucket.value * bucket.rows for bucket in buckets) / count
+    variance = sum((bucket.value - mean) ** 2 * bucket.rows for bucket in buckets) / count
+
+    # The median is the middle row, or the mean of the two middle rows
+    middle = [(count - 1) // 2, count // 2]
+    middle_values = []
+    seen = 0
+    for bucket in buckets:
+        while middle and middle[0] < seen + bucket.rows:
+            middle_values.append(bucket.value)
+            middle.pop(0)
+        seen += bucket.rows
+
+    return {
+        "count": count,
+        "mean": mean,
+        "median": sum(middle_values) / 2,
+        "stddev": math.sqrt(variance),
+        "min": buckets[0].value,
+        "max": buckets[-1].value,
+        "pass_rate": sum(bucket.passed for bucket in buckets) / count
+    }
+
+async def _grouped_distributions(db, source, group_names) -> list:
+    result = await db.execute(_histogram(source.subquery(), group_names))
+    return [
+        {**dict(zip(group_names, key)), **_distribution(list(buckets))}
+        for key, buckets in groupby(result, key=lambda row: tuple(getattr(row, name) for name in group_names))
+    ]
+
+async def subject_stats(db, semester: int = None, admission_year: int = None, subject_code: str = None) -> list:
+    """
+    Per-subject statistics of best_of_two, one row per (semester, subject_code).
+
+    Args:
+        db: Async database session
+        semester, admission_year, subject_code: Optional filters
+    """
+    source = select(
+        Mark.semester,
+        Mark.subject_code,
+        Mark.best_of_two.label("value"),
+        case((Mark.best_of_two >= PASS_MARK, 1), else_=0).label("passed")
+    )
+    if admission_year is not None:
+        source = source.join(Student, Student.reg_no == Mark.student_id).where(Student.admission_year == admission_year)
+    if semester is not None:
+        source = source.where(Mark.semester == semester)
+    if subject_code is not None:
+        source = source.where(Mark.subject_code == subject_code)
+
+    return await _grouped_distributions(db, source, ["semester", "subject_code"])
+
+async def cohort_stats(db, semester: int = None) -> list:
+    """
+    Compare admission-year cohorts, one row per (admission_year, semester).
+
+    Mean / median / stddev / min / max are over each student's semester
+    percentage; pass_rate is the share of students who passed every subject.
+    """
+    failed = (
+        select(Mark.student_id, Mark.semester)
+        .where(Mark.best_of_two < PASS_MARK)
+        .group_by(Mark.student_id, Mark.semester)
+        .subquery("failed")
+    )
+    source = (
+        select(
+            Student.admission_year,
+            SemesterSummary.semester,
+            SemesterSummary.percentage.label("value"),
+            case((failed.c.student_id.is_(None), 1), else_=0).label("passed")
+        )
+        .join(Student, Student.reg_no == SemesterSummary.student_id)
+        .outerjoin(failed, and_(
+            failed.c.student_id == SemesterSummary.student_id,
+            failed.c.semester == SemesterSummary.semester
+        ))
+    )
+    if semester is not None:
+        source = source.where(SemesterSummary.semester == semester)
+
+    return await _grouped_distributions(db, source, ["admission_year", "semester"])
+
+async def toppers(db, semester: int, admission_year: int = None, limit: int = DEFAULT_TOPPERS_LIMIT) -> list:
+    """Highest semester percentages, best first (ties broken by reg_no)"""
+    query = (
+        select(
+            Student.reg_no, Student.name, Student.admission_year,
+            SemesterSummary.semester, SemesterSummary.total_marks,
+            SemesterSummary.percentage, SemesterSummary.cgpa_cutoff
+        )
+        .join(Student, Student.reg_no == SemesterSummary.student_id)
+        .where(SemesterSummary.semester == semester)
+        .order_by(SemesterSummary.percentage.desc(), Student.reg_no)
+        .limit(limit)
+    )
+    if admission_year is not None:
+        query = query.where(Student.admission_year == admission_year)
+
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings()]
+
+async def student_percentiles(db, student) -> list:
+    """
+    Where a student's semester percentages rank within their admission-year cohort.
+
+    percentile is the share of the cohort scoring below the student, counting
+    ties as half (so the cohort median sits at 50).
+    """
+    mine = SemesterSummary.__table__.alias("mine")
+    others = SemesterSummary.__table__.alias("others")
+    query = (
+        select(
+            mine.c.semester,
+            mine.c.percentage,
+            func.count().label("cohort_size"),
+            func.sum(case((others.c.percentage > mine.c.percentage, 1), else_=0)).label("above"),
+            func.sum(case((others.c.percentage < mine.c.percentage, 1), else_=0)).label("below")
+        )
+        .join(others, others.c.semester == mine.c.semester)
+        .join(Student, and_(Student.reg_no == others.c.student_id, Student.admission_year == student.admission_year))
+        .where(mine.c.student_id == student.reg_no)
+        .group_by(mine.c.semester, mine.c.percentage)
+        .order_by(mine.c.semester)
+    )
+    result = await db.execute(query)
+
+    percentiles = []
+    for row in result:
+        ties = row.cohort_size - row.above - row.below
+        percentiles.append({
+            "semester": row.semester,
+            "percentage": row.percentage,
+            "rank": row.above + 1,
+            "cohort_size": row.cohort_size,
+            "percentile": 100.0 * (row.below + 0.5 * ties) / row.cohort_size
+        })
+    return percentiles
@@ -1,11 +1,15 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from models import Teacher, get_db
+from sqlalchemy import select, event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import AsyncSessionLocal, Teacher, get_db
+from cache import TTLCache
 import os
 from dotenv import load_dotenv
 
@@ -15,14 +19,105 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing pool - bcrypt is CPU bound, so it runs off the event loop
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()  # "thread" or "process"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# Resolved teachers, keyed by (username, token exp)
+TEACHER_CACHE_TTL_SECONDS = float(os.getenv("TEACHER_CACHE_TTL_SECONDS", "60"))
+TEACHER_CACHE_SIZE = int(os.getenv("TEACHER_CACHE_SIZE", "1024"))
+
+_pwd_context = None
 security = HTTPBearer()
+teacher_cache = TTLCache(maxsize=TEACHER_CACHE_SIZE, ttl=TEACHER_CACHE_TTL_SECONDS)
+
+def get_pwd_context():
+    """bcrypt context, created on first use so startup doesn't import passlib"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+_password_executor = None
+_password_jobs = 0  # Running plus queued jobs
+password_hash_stats = {
+    "calls": 0,
+    "rejected": 0,
+    "total_seconds": 0.0,
+    "max_seconds": 0.0,
+}
+
+def _get_password_executor():
+    global _password_executor
+    if _password_executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            from concurrent.futures import ProcessPoolExecutor
+            _password_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+            )
+    return _password_executor
+
+def shutdown_password_executor():
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=True)
+        _password_executor = None
+
+async def _run_password_job(func, *args):
+    """Run a bcrypt call in the worker pool, rejecting with 503 when the queue is full"""
+    global _password_jobs
+    if _password_jobs >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        password_hash_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login requests, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    
+    _password_jobs += 1
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_password_executor(), func, *args)
+    finally:
+        _password_jobs -= 1
+        elapsed = time.perf_counter() - start
+        password_hash_stats["calls"] += 1
+        password_hash_stats["total_seconds"] += elapsed
+        password_hash_stats["max_seconds"] = max(password_hash_stats["max_seconds"], elapsed)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_password_job(get_password_hash, password)
+
+def get_teacher_cache_stats() -> dict:
+    return teacher_cache.stats()
+
+def get_password_hash_stats() -> dict:
+    """Latency (including queue wait) and back-pressure counters for the hashing pool"""
+    calls = password_hash_stats["calls"]
+    return {
+        "executor": PASSWORD_HASH_EXECUTOR,
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        "in_flight": _password_jobs,
+        "calls": calls,
+        "rejected": password_hash_stats["rejected"],
+        "avg_seconds": password_hash_stats["total_seconds"] / calls if calls else 0.0,
+        "max_seconds": password_hash_stats["max_seconds"],
+    }
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -34,35 +129,80 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_teacher(db: Session, username: str, password: str):
-    teacher = db.query(Teacher).filter(Teacher.username == username).first()
+async def teacher_from_token(token: str) -> Optional[Teacher]:
+    """The existing teacher a valid, unexpired access token belongs to, or None"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("sub") is None:
+        return None
+    async with AsyncSessionLocal() as db:
+        return await _cached_teacher(db, payload["sub"], payload.get("exp"))
+
+def invalidate_teacher(username: str):
+    """Drop every cached entry for a teacher, whatever token it was resolved from"""
+    teacher_cache.invalidate(lambda key: key[0] == username)
+
+@event.listens_for(Teacher, "after_insert")
+@event.listens_for(Teacher, "after_update")
+@event.listens_for(Teacher, "after_delete")
+def _invalidate_changed_teacher(mapper, connection, target):
+    invalidate_teacher(target.username)
+    # A renamed teacher must not stay reachable under the old username
+    for old_username in inspect(target).attrs.username.history.deleted:
+        invalidate_teacher(old_username)
+
+async def get_teacher_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(Teacher).where(Teacher.username == username))
+    return result.scalars().first()
+
+async def authenticate_teacher(db: AsyncSession, username: str, password: str):
+    teacher = await get_teacher_by_username(db, username)
     if not teacher:
         return False
-    if not verify_password(password, teacher.hashed_password):
+    if not await verify_password_async(password, teacher.hashed_password):
         return False
     return teacher
 
-def create_teacher(db: Session, username: str, password: str, name: str):
+async def create_teacher(db: AsyncSession, username: str, password: str, name: str):
     # Check if username already exists
-    existing_teacher = db.query(Teacher).filter(Teacher.username == username).first()
+    existing_teacher = await get_teacher_by_username(db, username)
     if existing_teacher:
         return None
     
     # Create new teacher
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     new_teacher = Teacher(
         username=username,
         hashed_password=hashed_password,
         name=name
     )
     db.add(new_teacher)
-    db.commit()
-    db.refresh(new_teacher)
+    await db.commit()
+    await db.refresh(new_teacher)
     return new_teacher
 
+async def _cached_teacher(db: AsyncSession, username: str, exp):
+    cache_key = (username, exp)
+    teacher = teacher_cache.get(cache_key)
+    if teacher is not None:
+        return teacher
+    
+    teacher = await get_teacher_by_username(db, username)
+    if teacher is None:
+        return None
+    
+    # Never keep a teacher cached past the expiry of the token it was resolved from
+    ttl = TEACHER_CACHE_TTL_SECONDS
+    if exp is not None:
+        ttl = min(ttl, exp - time.time())
+    teacher_cache.set(cache_key, teacher, ttl)
+    return teacher
+
 async def get_current_teacher(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -77,7 +217,7 @@ async def get_current_teacher(
     except JWTError:
         raise credentials_exception
     
-    teacher = db.query(Teacher).filter(Teacher.username == username).first()
+    teacher = await _cached_teacher(db, username, payload.get("exp"))
     if teacher is None:
         raise credentials_exception
     return teacher
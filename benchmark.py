@@ -0,0 +1,591 @@
+"""
+Load Benchmark Script
+Run this script against a running server to measure requests/sec for the
+student lookup and marks routes.
+
+Usage:
+    python main.py                       # in one terminal
+    python benchmark.py --concurrency 50 --duration 10
+
+Requires httpx (pip install httpx). Run it once against the old launcher /
+commit and once against the new one to compare throughput.
+
+    python benchmark.py --serialization
+
+runs in-process instead (no server) and reports the cost of serializing one
+student's marks response with the old per-row Pydantic path and with the
+column-tuple path in serialization.py.
+
+    python benchmark.py --sqlite-concurrency
+
+checks that the app engine's pooled connections get the configured
+pragmas (journal_mode, busy_timeout, cache_size, synchronous), then holds a write transaction on one
+of them while other pooled connections read, and reports how long the
+readers waited (the write is rolled back). The old rollback journal is
+measured on a scratch database for comparison. Exits with status 1 if the
+pragmas are wrong or, in WAL mode, a reader waited for the writer.
+
+    python manage.py generate-students --count 100000
+    python benchmark.py --scenario --synthetic-count 100000 --concurrency 50
+
+runs a mixed workload of logins, student lookups, marks views and marks
+updates against random synthetic students and reports throughput and
+p50/p95/p99 latency per action. --mix changes the weights.
+
+    python benchmark.py --compare-launchers --duration 20
+
+starts the development launcher (python main.py) and then the production
+launcher (python serve.py) on port 8000, load tests each, stops it with
+SIGTERM, and prints throughput and shutdown time side by side.
+
+    python benchmark.py --search-ranking
+
+checks that the SQLite search query ranks all of its matches: in an
+in-memory index where more than SEARCH_CANDIDATE_LIMIT students match, the
+best match (inserted last) must come first. Exits with status 1 if not.
+
+    python benchmark.py --startup --runs 5
+
+measures cold start without a running server: how long `import main` takes
+in a fresh interpreter, how long a new uvicorn process takes to answer its
+first request on --url, and the startup schema check (migrations.py) next
+to the create_tables call it replaced. Reports the median of --runs.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+DEFAULT_ROUTES = [
+    "/api/student/{identifier}",
+    "/api/student/{identifier}/marks",
+]
+
+SCENARIO_ACTIONS = ["login", "lookup", "marks_view", "marks_update"]
+# Relative weights of the --scenario actions
+DEFAULT_MIX = "login=2,lookup=45,marks_view=40,marks_update=13"
+# Semester 1 is open for every student; the subject exists in sample and synthetic data
+UPDATE_SEMESTER, UPDATE_SUBJECT = 1, "CS101"
+
+async def get_token(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/api/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def worker(client, paths, headers, deadline, stats):
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code < 400:
+                stats["ok"] += 1
+            else:
+                stats["errors"] += 1
+        except httpx.HTTPError:
+            stats["errors"] += 1
+
+def parse_mix(mix: str) -> dict:
+    """'login=2,lookup=45' -> {"login": 2.0, "lookup": 45.0}"""
+    weights = {}
+    for part in mix.split(","):
+        action, _, weight = part.partition("=")
+        if action.strip() not in SCENARIO_ACTIONS:
+            raise ValueError(f"Unknown action {action.strip()!r}; choose from {', '.join(SCENARIO_ACTIONS)}")
+        weights[action.strip()] = float(weight)
+    return weights
+
+def _scenario_request(action: str, identifier: str, rng: random.Random, username: str, password: str) -> tuple:
+    """(method, path, JSON body) for one scenario action"""
+    if action == "login":
+        return "POST", "/api/login", {"username": username, "password": password}
+    if action == "lookup":
+        return "GET", f"/api/student/{identifier}", None
+    if action == "marks_view":
+        return "GET", f"/api/student/{identifier}/marks", None
+    return "PATCH", f"/api/student/{identifier}/marks/{UPDATE_SEMESTER}/{UPDATE_SUBJECT}", {
+        "internal_1": rng.randint(20, 50)
+    }
+
+async def scenario_worker(client, rng, identifiers, weights, credentials, headers, deadline, results):
+    actions, action_weights = list(weights), list(weights.values())
+    while time.perf_counter() < deadline:
+        action = rng.choices(actions, action_weights)[0]
+        method, path, body = _scenario_request(action, rng.choice(identifiers), rng, *credentials)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body, headers=headers)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        results[action]["latencies"].append(time.perf_counter() - start)
+        if not ok:
+            results[action]["errors"] += 1
+
+def percentile(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(len(sorted_values) * p / 100))
+    return sorted_values[rank - 1]
+
+def scenario_identifiers(synthetic_count: int, sample: int, seed: int, fallback) -> list:
+    """Random reg_no / UMIS / EMIS IDs of synthetic students, or the --identifiers list"""
+    if not synthetic_count:
+        return list(fallback)
+    from datagen import synthetic_identifiers
+
+    rng = random.Random(seed)
+    return [
+        rng.choice(synthetic_identifiers(rng.randint(1, synthetic_count)))
+        for _ in range(min(sample, synthetic_count * 3))
+    ]
+
+async def run_scenario(url, username, password, identifiers, weights, concurrency, duration, seed):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        token = await get_token(client, username, password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        results = {action: {"latencies": [], "errors": 0} for action in weights}
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[
+            scenario_worker(client, random.Random(f"{seed}:{i}"), identifiers, weights,
+                            (username, password), headers, deadline, results)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    print("\n" + "="*50)
+    print("LOAD TEST SCENARIO RESULTS")
+    print("="*50)
+    print(f"Target:        {url}")
+    print(f"Concurrency:   {concurrency}")
+    print(f"Duration:      {elapsed:.2f}s")
+    print(f"Students:      {len(set(identifiers))} identifiers")
+    print()
+    print(f"{'Action':<14}{'Requests':>10}{'Errors':>8}{'Req/sec':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    all_latencies, all_errors = [], 0
+    for action, result in results.items():
+        latencies = sorted(result["latencies"])
+        all_latencies.extend(latencies)
+        all_errors += result["errors"]
+        print(
+            f"{action:<14}{len(latencies):>10}{result['errors']:>8}{len(latencies) / elapsed:>10.1f}"
+            f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 95) * 1000:>9.1f}"
+            f"{percentile(latencies, 99) * 1000:>9.1f}"
+        )
+    all_latencies.sort()
+    print(
+        f"{'total':<14}{len(all_latencies):>10}{all_errors:>8}{len(all_latencies) / elapsed:>10.1f}"
+        f"{percentile(all_latencies, 50) * 1000:>9.1f}{percentile(all_latencies, 95) * 1000:>9.1f}"
+        f"{percentile(all_latencies, 99) * 1000:>9.1f}"
+    )
+
+def _sample_mark_rows(semesters: int, subjects: int) -> list:
+    """Rows shaped like serialization.semester_marks_query results"""
+    rows = []
+    for semester in range(1, semesters + 1):
+        total = 0.0
+        marks = []
+        for subject in range(subjects):
+            internal_1, internal_2 = 30.0 + subject, 45.0 - subject
+            total += max(internal_1, internal_2)
+            marks.append((semester, f"CS{semester}0{subject}", f"Subject {subject}", internal_1, internal_2,
+                          len(rows) + len(marks) + 1, "REG001", max(internal_1, internal_2)))
+        percentage = total / (subjects * 50) * 100
+        rows.extend(mark + (total, percentage, percentage / 9.5) for mark in marks)
+    return rows
+
+def _pydantic_marks_json(rows) -> bytes:
+    """The previous path: one schemas.Mark per row, SemesterMarks per semester, encoded by FastAPI"""
+    from fastapi.encoders import jsonable_encoder
+    from schemas import Mark, SemesterMarks
+
+    semester_marks = {}
+    totals = {}
+    for (semester, subject_code, subject_name, internal_1, internal_2,
+         mark_id, student_id, best_of_two, total_marks, percentage, cgpa_cutoff) in rows:
+        semester_marks.setdefault(semester, []).append(Mark(
+            id=mark_id, semester=semester, subject_code=subject_code, subject_name=subject_name,
+            internal_1=internal_1, internal_2=internal_2, student_id=student_id, best_of_two=best_of_two
+        ))
+        totals[semester] = (total_marks, percentage, cgpa_cutoff)
+    result = [
+        SemesterMarks(semester=semester, subjects=subjects, total_marks=totals[semester][0],
+                      percentage=totals[semester][1], cgpa_cutoff=totals[semester][2])
+        for semester, subjects in semester_marks.items()
+    ]
+    return json.dumps(jsonable_encoder(result)).encode()
+
+def run_serialization_benchmark(semesters: int, subjects: int, iterations: int):
+    from serialization import dumps, semester_marks_payload, orjson
+
+    rows = _sample_mark_rows(semesters, subjects)
+    paths = [
+        ("Pydantic per row", lambda: _pydantic_marks_json(rows)),
+        ("Column tuples", lambda: dumps(semester_marks_payload(rows))),
+    ]
+    assert json.loads(paths[0][1]()) == json.loads(paths[1][1]())
+
+    print("\n" + "="*50)
+    print("MARKS SERIALIZATION BENCHMARK")
+    print("="*50)
+    print(f"Marks/student: {len(rows)} ({semesters} semesters x {subjects} subjects)")
+    print(f"Encoder:       {'orjson' if orjson is not None else 'json'}")
+    for name, serialize in paths:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            serialize()
+        elapsed = time.perf_counter() - start
+        print(f"{name + ':':<18} {elapsed / iterations * 1e6:8.1f} us/student")
+
+def _timed_sqlite_reads(connect, hold_seconds: float, readers: int) -> tuple:
+    """Read from `readers` connections while another connection holds a write lock"""
+    writer = connect()
+    cursor = writer.cursor()
+    cursor.execute("BEGIN EXCLUSIVE")
+    cursor.execute("UPDATE marks SET internal_1 = internal_1 WHERE id = (SELECT MIN(id) FROM marks)")
+
+    latencies, errors = [], []
+    def read():
+        start = time.perf_counter()
+        try:
+            connection = connect()
+            try:
+                # A point read, so the time measured is lock waiting rather than scanning
+                connection.cursor().execute(
+                    "SELECT internal_1 FROM marks WHERE id = (SELECT MAX(id) FROM marks)"
+                ).fetchone()
+            finally:
+                connection.close()
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(hold_seconds)
+    writer.rollback()  # The check never changes data
+    writer.close()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+def _rollback_journal_reads(hold_seconds: float, readers: int) -> tuple:
+    """The same reads against a scratch database in the old rollback-journal mode"""
+    from models import sqlite_pragmas
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "concurrency.db")
+
+        def connect():
+            connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            for pragma in sqlite_pragmas("DELETE"):
+                connection.execute(pragma)
+            return connection
+
+        setup = connect()
+        setup.execute("CREATE TABLE marks (id INTEGER PRIMARY KEY, internal_1 REAL)")
+        setup.executemany("INSERT INTO marks (internal_1) VALUES (?)", [(i % 50,) for i in range(10000)])
+        setup.close()
+        return _timed_sqlite_reads(connect, hold_seconds, readers)
+
+SQLITE_SYNCHRONOUS_LEVELS = {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3}
+
+def _engine_pragma_errors() -> list:
+    """Differences between the pragmas on a pooled app connection and the configured ones"""
+    import models
+
+    # journal_mode persists in the file and Python's sqlite3 already waits 5s on a
+    # busy database, so the per-connection cache_size and synchronous show
+    # whether the connect listener ran at all
+    expected = {
+        "journal_mode": models.SQLITE_JOURNAL_MODE.lower(),
+        "busy_timeout": models.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -models.SQLITE_CACHE_SIZE_KB,
+        "synchronous": SQLITE_SYNCHRONOUS_LEVELS.get(models.SQLITE_SYNCHRONOUS.upper(), models.SQLITE_SYNCHRONOUS),
+    }
+    connection = models.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        actual = {name: cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in expected}
+    finally:
+        connection.close()
+    return [
+        f"PRAGMA {name} is {actual[name]!r}, expected {value!r}"
+        for name, value in expected.items() if str(actual[name]).lower() != str(value)
+    ]
+
+def run_search_ranking_check() -> bool:
+    import search
+
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE students (reg_no TEXT PRIMARY KEY, umis_id TEXT, emis_id TEXT, name TEXT, admission_year INTEGER)"
+    )
+    connection.execute(search.SQLITE_FTS_TABLE)
+    for trigger in search.SQLITE_FTS_TRIGGERS.values():
+        connection.execute(trigger)
+    # Twice the candidate limit of students match "kumar" by name only; the
+    # best match, on its reg_no (an ID column), is found after all of them
+    fillers = [(f"F{i:06d}", f"FU{i:06d}", f"FE{i:06d}", "Kumar Filler", 2024)
+               for i in range(search.SEARCH_CANDIDATE_LIMIT * 2)]
+    connection.executemany("INSERT INTO students VALUES (?, ?, ?, ?, ?)",
+                           fillers + [("KUMAR01", "KU01", "KE01", "Best Match", 2024)])
+
+    rows = connection.execute(search.SQLITE_SEARCH, {
+        "match": '"kumar"*', "candidates": search.SEARCH_CANDIDATE_LIMIT, "limit": 3
+    }).fetchall()
+    connection.close()
+    passed = bool(rows) and rows[0][0] == "KUMAR01"
+    print(f"Best match ranked first among {len(fillers) + 1} matches: {'PASS' if passed else 'FAIL'}"
+          f" (top results: {', '.join(row[0] for row in rows)})")
+    return passed
+
+def run_sqlite_concurrency_check(hold_seconds: float, readers: int) -> bool:
+    import models
+
+    if models.engine.dialect.name != "sqlite":
+        print("The SQLite concurrency check only applies with USE_SQLITE=True")
+        return True
+
+    print("\n" + "="*50)
+    print("SQLITE READERS VS WRITER")
+    print("="*50)
+    # Through the app's pool, so the engine's connect listener is what's being tested
+    pragma_errors = _engine_pragma_errors()
+    for error in pragma_errors:
+        print(f"FAIL: {error}")
+
+    print(f"Writer holds its transaction for {hold_seconds:.1f}s; {readers} readers start meanwhile")
+    latencies, errors = _timed_sqlite_reads(models.engine.raw_connection, hold_seconds, readers)
+    models.engine.dispose()
+    slowest = max(latencies) if latencies else None
+    journal_mode = models.SQLITE_JOURNAL_MODE.upper()
+    print(f"{journal_mode + ':':<8} {len(latencies)} reads ok, "
+          f"slowest {f'{slowest * 1000:.1f}ms' if slowest is not None else '-'}, {len(errors)} failed (app engine)")
+
+    if journal_mode != "DELETE":
+        baseline, baseline_errors = _rollback_journal_reads(hold_seconds, readers)
+        baseline_slowest = f"{max(baseline) * 1000:.1f}ms" if baseline else "-"
+        print(f"{'DELETE:':<8} {len(baseline)} reads ok, slowest {baseline_slowest}, "
+              f"{len(baseline_errors)} failed (scratch database, for comparison)")
+
+    passed = not pragma_errors
+    if journal_mode == "WAL" and (errors or slowest is None or slowest >= hold_seconds):
+        print("FAIL: readers waited for the writer")
+        passed = False
+    print("PASS" if passed else "FAILED")
+    return passed
+
+async def run_benchmark(url, username, password, identifiers, concurrency, duration):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        token = await get_token(client, username, password)
+        headers = {"Authorization": f"Bearer {token}"}
+        paths = [route.format(identifier=identifier) for identifier in identifiers for route in DEFAULT_ROUTES]
+
+        stats = {"ok": 0, "errors": 0}
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[
+            worker(client, paths, headers, deadline, stats) for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    total = stats["ok"] + stats["errors"]
+    print("\n" + "="*50)
+    print("LOAD BENCHMARK RESULTS")
+    print("="*50)
+    print(f"Target:        {url}")
+    print(f"Concurrency:   {concurrency}")
+    print(f"Duration:      {elapsed:.2f}s")
+    print(f"Requests:      {total} ({stats['errors']} errors)")
+    print(f"Requests/sec:  {total / elapsed:.1f}")
+    return {"requests": total, "errors": stats["errors"], "requests_per_second": total / elapsed}
+
+# Both listen on port 8000
+LAUNCHERS = [
+    ("python main.py", [sys.executable, "main.py"]),
+    ("python serve.py", [sys.executable, "serve.py"]),
+]
+
+def wait_until_ready(url: str, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            httpx.get(url + "/", timeout=1)
+            return True
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    return False
+
+def run_launcher_comparison(url, username, password, identifiers, concurrency, duration):
+    results = []
+    for name, command in LAUNCHERS:
+        print(f"\nStarting {name} ...")
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_until_ready(url, timeout=60):
+                print(f"{name} did not start listening on {url}")
+                continue
+            result = asyncio.run(run_benchmark(url, username, password, identifiers, concurrency, duration))
+        finally:
+            # SIGTERM is what process managers send; both launchers should drain and exit cleanly
+            stop_started = time.perf_counter()
+            process.send_signal(signal.SIGTERM)
+            try:
+                exit_code = process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                exit_code = "killed"
+            stop_seconds = time.perf_counter() - stop_started
+        results.append((name, result, stop_seconds, exit_code))
+
+    print("\n" + "="*50)
+    print("LAUNCHER COMPARISON")
+    print("="*50)
+    print(f"{'Launcher':<18}{'Req/sec':>10}{'Errors':>8}{'Stop (s)':>10}{'Exit':>6}")
+    for name, result, stop_seconds, exit_code in results:
+        print(f"{name:<18}{result['requests_per_second']:>10.1f}{result['errors']:>8}{stop_seconds:>10.2f}{exit_code!s:>6}")
+
+IMPORT_TIMER = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+def _first_response_seconds(url: str) -> float:
+    """Start a fresh uvicorn process and time it until it answers GET /"""
+    address = urlsplit(url)
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", address.hostname, "--port", str(address.port or 80), "--log-level", "warning",
+    ]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while process.poll() is None and time.perf_counter() - start < 60:
+            try:
+                httpx.get(url + "/", timeout=1)
+                return time.perf_counter() - start
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        raise RuntimeError(f"uvicorn did not answer on {url} (exit code {process.poll()})")
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def _median_ms(func, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def run_startup_benchmark(url: str, runs: int):
+    import_ms = statistics.median(
+        float(subprocess.run([sys.executable, "-c", IMPORT_TIMER], capture_output=True, text=True, check=True).stdout)
+        for _ in range(runs)
+    ) * 1000
+    first_response_ms = statistics.median(_first_response_seconds(url) for _ in range(runs)) * 1000
+
+    import migrations
+    import models
+    schema_check_ms = _median_ms(migrations.check_schema, runs)
+    create_tables_ms = _median_ms(models.create_tables, runs)
+    models.engine.dispose()
+
+    print("\n" + "="*50)
+    print(f"STARTUP (median of {runs} runs)")
+    print("="*50)
+    print(f"import main:                     {import_ms:8.1f} ms")
+    print(f"process start to first response: {first_response_ms:8.1f} ms")
+    print(f"schema version check:            {schema_check_ms:8.1f} ms")
+    print(f"create_tables (replaced):        {create_tables_ms:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the student portal")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="teacher1")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--identifiers", nargs="+", default=["REG001", "UMIS002", "EMIS003"])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--serialization", action="store_true",
+                        help="Benchmark marks serialization in-process instead of load testing a server")
+    parser.add_argument("--semesters", type=int, default=6)
+    parser.add_argument("--subjects", type=int, default=7)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--sqlite-concurrency", action="store_true",
+                        help="Check that SQLite readers don't wait for a writer")
+    parser.add_argument("--hold", type=float, default=1.0, help="Seconds the writer holds its lock")
+    parser.add_argument("--scenario", action="store_true",
+                        help="Run the mixed login / lookup / marks view / marks update workload")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Action weights for --scenario")
+    parser.add_argument("--synthetic-count", type=int, default=0,
+                        help="Pick --scenario students from the first N generated by manage.py generate-students")
+    parser.add_argument("--sample", type=int, default=10000, help="Distinct identifiers used by --scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare-launchers", action="store_true",
+                        help="Start python main.py, then python serve.py, and load test each")
+    parser.add_argument("--search-ranking", action="store_true",
+                        help="Check that search ranks every match, not just the first candidates")
+    parser.add_argument("--startup", action="store_true",
+                        help="Measure import time, time to first response and the startup schema check")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions for --startup")
+    args = parser.parse_args()
+
+    if args.search_ranking:
+        sys.exit(0 if run_search_ranking_check() else 1)
+
+    if args.startup:
+        run_startup_benchmark(args.url, args.runs)
+        return
+
+    if args.compare_launchers:
+        run_launcher_comparison(
+            args.url, args.username, args.password, args.identifiers, args.concurrency, args.duration
+        )
+        return
+
+    if args.sqlite_concurrency:
+        sys.exit(0 if run_sqlite_concurrency_check(args.hold, args.concurrency) else 1)
+
+    if args.serialization:
+        run_serialization_benchmark(args.semesters, args.subjects, args.iterations)
+        return
+
+    if args.scenario:
+        identifiers = scenario_identifiers(args.synthetic_count, args.sample, args.seed, args.identifiers)
+        asyncio.run(run_scenario(
+            args.url, args.username, args.password, identifiers, parse_mix(args.mix),
+            args.concurrency, args.duration, args.seed
+        ))
+        return
+
+    asyncio.run(run_benchmark(
+        args.url, args.username, args.password, args.identifiers,
+        args.concurrency, args.duration
+    ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Synthetic Data Generator
+Fill the database with production-sized, reproducible student data.
+
+Student number i always gets the same identifiers, details and marks for a
+given seed, no matter how the run is chunked or how many students were
+generated before. Re-running a command therefore skips the students that
+already exist, and a larger --count extends an earlier run.
+
+Every unique column (reg_no, UMIS / EMIS IDs, Aadhar number) is built from
+the prefix and the index, so batches with different --prefix values can share
+a database. Students whose values are taken anyway (e.g. by real students, or
+by a prefix that happens to look like another prefix plus "U") are skipped
+and counted as conflicts rather than failing the chunk.
+
+Rows are written with bulk inserts, one transaction per chunk, and each
+chunk's semester_summaries are recomputed in the same transaction.
+"""
+
+import random
+import time
+import zlib
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from models import (
+    engine, Student, Mark, StudentIdentifier, student_identifier_rows,
+    calculate_current_semester, semester_summary_statements
+)
+
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_PREFIX = "SYN"
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Akash", "Ananya", "Arjun", "Bhavya", "Deepak", "Divya", "Gokul", "Harini",
+    "Ishaan", "Janani", "Karthik", "Kavya", "Lakshmi", "Manoj", "Meera", "Naveen", "Nisha", "Pooja",
+    "Pranav", "Priya", "Rahul", "Revathi", "Sanjay", "Shreya", "Surya", "Swathi", "Vignesh", "Yamini"
+]
+LAST_NAMES = [
+    "Anand", "Balaji", "Chandran", "Devi", "Ganesan", "Iyer", "Krishnan", "Kumar", "Mani", "Murugan",
+    "Nair", "Natarajan", "Pillai", "Raghavan", "Rajan", "Ramesh", "Sekar", "Subramanian", "Sundaram", "Venkatesh"
+]
+STREETS = ["Main Street", "Oak Avenue", "Pine Road", "Temple Street", "Lake View Road", "Gandhi Nagar", "Anna Salai"]
+CITIES = ["Chennai", "Coimbatore", "Madurai", "Salem", "Tiruchirappalli", "Vellore", "Erode"]
+
+# Seven subjects per semester; semesters 1-3 match setup_database.py
+SUBJECTS_BY_SEMESTER = {
+    1: [("CS101", "Introduction to Programming"), ("MA101", "Mathematics I"), ("PH101", "Physics I"),
+        ("EN101", "English Communication"), ("CS102", "Computer Fundamentals"),
+        ("MA102", "Discrete Mathematics"), ("CS103", "Data Structures")],
+    2: [("CS201", "Object Oriented Programming"), ("MA201", "Mathematics II"), ("PH201", "Physics II"),
+        ("CS202", "Database Systems"), ("CS203", "Computer Networks"),
+        ("CS204", "Operating Systems"), ("CS205", "Software Engineering")],
+    3: [("CS301", "Algorithms"), ("CS302", "Computer Graphics"), ("CS303", "Web Development"),
+        ("CS304", "Mobile Computing"), ("CS305", "Machine Learning"),
+        ("CS306", "Artificial Intelligence"), ("CS307", "Compiler Design")],
+    4: [("CS401", "Distributed Systems"), ("CS402", "Cloud Computing"), ("CS403", "Information Security"),
+        ("CS404", "Data Mining"), ("MA401", "Probability and Statistics"),
+        ("CS405", "Theory of Computation"), ("CS406", "Embedded Systems")],
+    5: [("CS501", "Big Data Analytics"), ("CS502", "Internet of Things"), ("CS503", "Deep Learning"),
+        ("CS504", "Software Testing"), ("CS505", "Human Computer Interaction"),
+        ("CS506", "Natural Language Processing"), ("CS507", "Blockchain Technology")],
+    6: [("CS601", "Project Work"), ("CS602", "Computer Vision"), ("CS603", "DevOps"),
+        ("CS604", "Parallel Computing"), ("CS605", "Professional Ethics"),
+        ("CS606", "Quantum Computing"), ("CS607", "Entrepreneurship")],
+}
+
+def synthetic_identifiers(index: int, prefix: str = DEFAULT_PREFIX) -> tuple:
+    """(reg_no, umis_id, emis_id) of synthetic student number `index`"""
+    return f"{prefix}{index:07d}", f"{prefix}U{index:07d}", f"{prefix}E{index:07d}"
+
+def synthetic_aadhar_number(index: int, prefix: str = DEFAULT_PREFIX) -> str:
+    """12 digits: 9 (real Aadhar numbers never start with 9), 4 derived from the prefix, then the index"""
+    return f"9{zlib.crc32(prefix.encode()) % 10000:04d}{index:07d}"
+
+def _internal_mark(rng: random.Random, ability: float) -> float:
+    """An internal out of 50, in half marks, centred on the student's ability"""
+    return min(50.0, max(0.0, round(rng.gauss(ability, 6) * 2) / 2))
+
+def synthetic_student(index: int, seed: int = DEFAULT_SEED, prefix: str = DEFAULT_PREFIX,
+                      current_date: datetime = None) -> tuple:
+    """
+    Generate one student and their marks.
+
+    Admission years cover the batches currently studying (1st to 3rd year)
+    plus the batch that just graduated, and every semester up to the
+    student's current one has marks.
+
+    Returns:
+        (student row, list of mark rows), as dicts ready for bulk insert
+    """
+    if current_date is None:
+        current_date = datetime.now()
+
+    rng = random.Random(f"{seed}:{index}")
+    reg_no, umis_id, emis_id = synthetic_identifiers(index, prefix)
+    admission_year = current_date.year - rng.randrange(4)
+    student = {
+        "reg_no": reg_no,
+        "umis_id": umis_id,
+        "emis_id": emis_id,
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "aadhar_number": synthetic_aadhar_number(index, prefix),
+        "phone_number": f"{rng.choice('6789')}{rng.randrange(10**9):09d}",
+        "address": f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}",
+        "admission_year": admission_year
+    }
+
+    ability = rng.uniform(22, 46)
+    marks = []
+    for semester in range(1, calculate_current_semester(admission_year, current_date) + 1):
+        for subject_code, subject_name in SUBJECTS_BY_SEMESTER[semester]:
+            marks.append({
+                "student_id": reg_no,
+                "semester": semester,
+                "subject_code": subject_code,
+                "subject_name": subject_name,
+                "internal_1": _internal_mark(rng, ability),
+                "internal_2": _internal_mark(rng, ability)
+            })
+    return student, marks
+
+def generate_students(count: int, seed: int = DEFAULT_SEED, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      start: int = 1, prefix: str = DEFAULT_PREFIX, progress=None) -> dict:
+    """
+    Insert synthetic students start .. start + count - 1 that don't exist yet.
+
+    Args:
+        count: Number of students
+        seed: Seed for names, admission years and marks
+        chunk_size: Students written per transaction
+        start: Index of the first student
+        prefix: Prefix of the generated identifiers
+        progress: Optional callable receiving the report after each chunk
+
+    Returns:
+        Report with counts and students/sec
+    """
+    report = {"students": 0, "skipped": 0, "conflicts": 0, "marks": 0}
+    started = time.perf_counter()
+    current_date = datetime.now()
+
+    for chunk_start in range(start, start + count, chunk_size):
+        indexes = range(chunk_start, min(chunk_start + chunk_size, start + count))
+        generated = [synthetic_student(index, seed, prefix, current_date) for index in indexes]
+
+        with engine.begin() as connection:
+            existing = set(connection.execute(
+                select(Student.reg_no).where(Student.reg_no.in_([student["reg_no"] for student, _ in generated]))
+            ).scalars())
+            new = [(student, marks) for student, marks in generated if student["reg_no"] not in existing]
+            # Any unique value already used by another student makes the row a conflict
+            taken_identifiers = set(connection.execute(
+                select(StudentIdentifier.identifier).where(StudentIdentifier.identifier.in_(
+                    [identifier for student, _ in new for identifier in (student["reg_no"], student["umis_id"], student["emis_id"])]
+                ))
+            ).scalars())
+            taken_aadhar = set(connection.execute(
+                select(Student.aadhar_number).where(Student.aadhar_number.in_([student["aadhar_number"] for student, _ in new]))
+            ).scalars())
+            new = [
+                (student, marks) for student, marks in new
+                if student["aadhar_number"] not in taken_aadhar
+                and taken_identifiers.isdisjoint((student["reg_no"], student["umis_id"], student["emis_id"]))
+            ]
+            student_rows = [student for student, _ in new]
+            mark_rows = [mark for _, marks in new for mark in marks]
+
+            if student_rows:
+                connection.execute(insert(Student), student_rows)
+                connection.execute(insert(StudentIdentifier), student_identifier_rows(student_rows))
+            if mark_rows:
+                connection.execute(insert(Mark), mark_rows)
+                for statement in semester_summary_statements([student["reg_no"] for student in student_rows]):
+                    connection.execute(statement)
+
+        report["students"] += len(student_rows)
+        report["skipped"] += len(existing)
+        report["conflicts"] += len(indexes) - len(existing) - len(student_rows)
+        report["marks"] += len(mark_rows)
+        if progress is not None:
+            progress(report)
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["students_per_second"] = round(report["students"] / elapsed, 1) if elapsed > 0 else 0.0
+    return report
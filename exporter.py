@@ -0,0 +1,76 @@
+"""
+Bulk Export
+Stream students and marks as CSV or NDJSON.
+
+Rows are fetched in batches of EXPORT_BATCH_SIZE through a server-side
+cursor (yield_per) and written out batch by batch, so memory use stays
+constant however large the tables get.
+"""
+
+import csv
+import io
+import json
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from models import read_session, Student, Mark
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+def students_query(admission_year: int = None):
+    query = select(
+        Student.reg_no, Student.umis_id, Student.emis_id, Student.name,
+        Student.aadhar_number, Student.phone_number, Student.address, Student.admission_year
+    ).order_by(Student.reg_no)
+    if admission_year is not None:
+        query = query.where(Student.admission_year == admission_year)
+    return query
+
+def marks_query(admission_year: int = None, semester: int = None):
+    query = select(
+        Mark.id, Mark.student_id, Mark.semester, Mark.subject_code, Mark.subject_name,
+        Mark.internal_1, Mark.internal_2, Mark.best_of_two.label("best_of_two")
+    ).order_by(Mark.student_id, Mark.semester, Mark.id)
+    if admission_year is not None:
+        query = query.join(Student, Student.reg_no == Mark.student_id).where(
+            Student.admission_year == admission_year
+        )
+    if semester is not None:
+        query = query.where(Mark.semester == semester)
+    return query
+
+async def stream_rows(query, export_format: str):
+    """Yield the query's rows as CSV or NDJSON text, one batch at a time"""
+    # The export gets its own session because it outlives the request handler
+    async with read_session() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+
+        async for batch in result.partitions():
+            buffer = io.StringIO()
+            if export_format == "csv":
+                csv.writer(buffer).writerows(batch)
+            else:
+                for row in batch:
+                    buffer.write(json.dumps(dict(zip(columns, row))))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+
+def export_response(query, export_format: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(query, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'}
+    )
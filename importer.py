@@ -0,0 +1,242 @@
+"""
+Bulk Student Import
+Load students and their marks from CSV or XLSX files in chunks.
+
+Each row describes one student. The columns are the student fields
+(reg_no, umis_id, emis_id, name, aadhar_number, phone_number, address,
+admission_year) plus optional marks columns named like the fields on the
+enter-student form: semester_<n>_subject_<k>_code, _name, _internal1 and
+_internal2.
+
+Every chunk is read and validated against schemas.StudentCreateWithMarks in a
+worker thread, so parsing a large upload doesn't stall other requests, then
+checked for duplicate identifiers with one query and written with bulk
+inserts in a single transaction.
+"""
+
+import csv
+import io
+import re
+import time
+from itertools import islice
+
+import anyio
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from models import (
+    AsyncSessionLocal, Student, Mark, StudentIdentifier, find_taken_identifiers,
+    refresh_semester_summaries, student_identifier_rows, get_academic_year_info,
+    duplicate_subject_error
+)
+from schemas import StudentCreateWithMarks
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+STUDENT_FIELDS = [
+    "reg_no", "umis_id", "emis_id", "name",
+    "aadhar_number", "phone_number", "address", "admission_year"
+]
+MARK_COLUMN = re.compile(r"^semester_(\d+)_subject_(\d+)_(code|name|internal1|internal2)$")
+
+def iter_csv_rows(stream):
+    """Yield one dict per CSV row from a text or binary stream"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    yield from csv.DictReader(stream)
+
+def iter_xlsx_rows(stream):
+    """Yield one dict per row of the first worksheet (requires openpyxl)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("XLSX import requires openpyxl (pip install openpyxl)")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+        for values in rows:
+            row = {}
+            for column, value in zip(header, values):
+                # Spreadsheets store numeric IDs and years as floats
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                row[column] = "" if value is None else str(value)
+            yield row
+    finally:
+        workbook.close()
+
+def iter_import_rows(stream, filename: str):
+    """Pick the reader for a file based on its extension"""
+    if filename and filename.lower().endswith(".xlsx"):
+        return iter_xlsx_rows(stream)
+    return iter_csv_rows(stream)
+
+def parse_row(row: dict) -> StudentCreateWithMarks:
+    """
+    Validate one import row.
+
+    Raises:
+        ValueError: (including pydantic's ValidationError) if the row is invalid
+    """
+    student_data = {field: (row.get(field) or "").strip() for field in STUDENT_FIELDS}
+    missing = [field for field, value in student_data.items() if not value]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    # Collect marks columns, skipping subjects that were left completely empty
+    subjects = {}
+    for column, value in row.items():
+        match = MARK_COLUMN.match(column or "")
+        if match and value is not None and str(value).strip():
+            semester, subject, field = match.groups()
+            subjects.setdefault((int(semester), int(subject)), {})[field] = str(value).strip()
+
+    marks = []
+    for (semester, subject), fields in sorted(subjects.items()):
+        if len(fields) != 4:
+            raise ValueError(f"Incomplete marks for semester {semester} subject {subject}")
+        marks.append({
+            "student_id": student_data["reg_no"],
+            "semester": semester,
+            "subject_code": fields["code"],
+            "subject_name": fields["name"],
+            "internal_1": fields["internal1"],
+            "internal_2": fields["internal2"]
+        })
+
+    # Caught here, or the marks unique index rejects the whole chunk
+    duplicate_error = duplicate_subject_error(marks)
+    if duplicate_error:
+        raise ValueError(duplicate_error)
+
+    student = StudentCreateWithMarks(**student_data, marks=marks)
+
+    available_semesters = get_academic_year_info(student.admission_year)['available_semesters']
+    for mark in student.marks:
+        if mark.semester not in available_semesters:
+            raise ValueError(
+                f"Cannot add marks for semester {mark.semester}. "
+                f"Student is currently in semester {max(available_semesters)}"
+            )
+
+    return student
+
+def _format_error(error) -> str:
+    if hasattr(error, "errors"):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+            for detail in error.errors()
+        )
+    return str(error)
+
+def _record_error(report: dict, line: int, error):
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": line, "error": _format_error(error)})
+
+async def _insert_students(db, students) -> int:
+    """Bulk insert students, their identifiers and marks; returns the number of marks written"""
+    student_rows = [student.model_dump(exclude={"marks"}) for student in students]
+    mark_rows = [
+        {**mark.model_dump(), "student_id": student.reg_no}
+        for student in students for mark in student.marks
+    ]
+
+    await db.execute(insert(Student), student_rows)
+    await db.execute(insert(StudentIdentifier), student_identifier_rows(student_rows))
+    if mark_rows:
+        await db.execute(insert(Mark), mark_rows)
+        await refresh_semester_summaries(db, [student.reg_no for student in students])
+    return len(mark_rows)
+
+async def _import_chunk(db, chunk, report: dict):
+    # One query finds every identifier in the chunk that is already taken
+    identifiers = [i for _, student in chunk for i in (student.reg_no, student.umis_id, student.emis_id)]
+    taken = await find_taken_identifiers(db, identifiers) if identifiers else set()
+
+    accepted = []
+    for line, student in chunk:
+        student_ids = {student.reg_no, student.umis_id, student.emis_id}
+        clashes = student_ids & taken
+        if clashes:
+            _record_error(report, line, f"Student with identifier {', '.join(sorted(clashes))} already exists")
+            continue
+        taken |= student_ids  # Also catches duplicates within the file
+        accepted.append((line, student))
+
+    if not accepted:
+        return
+
+    try:
+        marks_written = await _insert_students(db, [student for _, student in accepted])
+        await db.commit()
+        report["imported"] += len(accepted)
+        report["marks"] += marks_written
+        return
+    except IntegrityError:
+        await db.rollback()
+
+    # Something else in the chunk violated a constraint (e.g. a duplicate
+    # Aadhar number), so retry row by row to report exactly which rows failed
+    for line, student in accepted:
+        try:
+            marks_written = await _insert_students(db, [student])
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            _record_error(report, line, f"Database rejected row: {e.orig}")
+            continue
+        report["imported"] += 1
+        report["marks"] += marks_written
+
+def _parse_chunk(numbered_rows, chunk_size: int):
+    """Read and validate the next chunk: (rows read, [(line, student)], [(line, error)])"""
+    chunk = list(islice(numbered_rows, chunk_size))
+    valid, errors = [], []
+    for line, row in chunk:
+        try:
+            valid.append((line, parse_row(row)))
+        except ValueError as e:
+            errors.append((line, e))
+    return len(chunk), valid, errors
+
+async def import_students(db, rows, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Import students (with marks) from an iterable of row dicts.
+
+    Args:
+        db: Async database session
+        rows: Iterable of dicts, e.g. from iter_csv_rows / iter_xlsx_rows
+        chunk_size: Rows validated and committed together
+
+    Returns:
+        Report with row counts, per-row errors and rows/sec
+    """
+    report = {"rows": 0, "imported": 0, "failed": 0, "marks": 0, "errors": []}
+    start = time.perf_counter()
+
+    numbered_rows = enumerate(rows, start=2)  # Row 1 is the header
+    while True:
+        read, valid, errors = await anyio.to_thread.run_sync(_parse_chunk, numbered_rows, chunk_size)
+        if not read:
+            break
+        report["rows"] += read
+        for line, error in errors:
+            _record_error(report, line, error)
+
+        await _import_chunk(db, valid, report)
+
+    report["errors"].sort(key=lambda error: error["row"])
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+    return report
+
+async def import_students_file(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Import a CSV or XLSX file from disk"""
+    async with AsyncSessionLocal() as db:
+        with open(path, "rb") as stream:
+            return await import_students(db, iter_import_rows(stream, path), chunk_size)
@@ -1,18 +1,31 @@
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from contextlib import asynccontextmanager
-from models import create_tables
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import logging
+from models import dispose_engines, sync_engines
+from migrations import check_schema
+from auth import shutdown_password_executor
 from routes import router
-import uvicorn
+from rendering import PrecompressedStaticFiles
+from metrics import METRICS_ENABLED, METRICS_TOKEN, MetricsMiddleware, instrument_engine
+import querylog
+from profiling import PROFILING_ENABLED, ProfilerMiddleware
+from warmup import WARM_TEMPLATES, WARM_STUDENT_COUNT, warm_up
 
 # Lifespan event handler
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    create_tables()
+    # Startup: one schema_version read (see migrations.py), then serve while warming up
+    check_schema()
+    warmup = asyncio.create_task(warm_up()) if WARM_TEMPLATES or WARM_STUDENT_COUNT else None
     yield
     # Shutdown
-    pass
+    if warmup is not None:
+        warmup.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup  # Let it close its database session before the pools go
+    shutdown_password_executor()
+    await dispose_engines()
 
 # Create FastAPI app
 app = FastAPI(
@@ -22,11 +35,30 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Request latency, query and template metrics (served on /metrics)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    for sync_engine in sync_engines:
+        instrument_engine(sync_engine)
+    if not METRICS_TOKEN:
+        logging.getLogger(__name__).warning("METRICS_ENABLED without METRICS_TOKEN: /metrics is not served")
+
+# Development / staging: slow-query log, N+1 detection and query budgets
+if querylog.QUERY_LOG_ENABLED:
+    app.add_middleware(querylog.QueryLogMiddleware)
+    for sync_engine in sync_engines:
+        querylog.instrument_engine(sync_engine)
+
+# Admin-requested per-request profiles (see /admin/profiles)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # Include routes
 app.include_router(router)
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,154 @@
+"""
+Management Commands
+Run maintenance tasks against the configured database.
+
+Usage:
+    python manage.py migrate
+    python manage.py grant-admin <username> [--revoke]
+    python manage.py rebuild-summaries
+    python manage.py import-students students.csv [--chunk-size 500]
+    python manage.py rebuild-search-index
+    python manage.py compress-static
+    python manage.py generate-students --count 1000000 [--seed 42] [--chunk-size 5000]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import models
+import migrations
+from importer import import_students_file, DEFAULT_CHUNK_SIZE
+import datagen
+from search import create_search_index
+from rendering import compress_static as compress_static_files
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate(args):
+    """Apply pending schema migrations"""
+    start = time.perf_counter()
+    applied = migrations.migrate()
+    if applied:
+        logger.info(f"Applied migrations {', '.join(map(str, applied))} in {time.perf_counter() - start:.2f}s")
+    else:
+        logger.info(f"Schema is up to date (version {migrations.LATEST_VERSION})")
+
+def grant_admin(args):
+    """Make an existing teacher an admin (allowed to use the request profiler)"""
+    migrations.migrate()
+    with models.engine.begin() as connection:
+        updated = connection.execute(
+            models.Teacher.__table__.update()
+            .where(models.Teacher.username == args.username)
+            .values(is_admin=not args.revoke)
+        ).rowcount
+    if not updated:
+        raise SystemExit(f"No teacher named {args.username}")
+    logger.info(f"{args.username} is {'no longer' if args.revoke else 'now'} an admin")
+
+def rebuild_summaries(args):
+    """Recompute semester_summaries from the marks table"""
+    migrations.migrate()
+    start = time.perf_counter()
+    models.rebuild_semester_summaries()
+    logger.info(f"Rebuilt semester summaries in {time.perf_counter() - start:.2f}s")
+
+async def _import_students_file(path: str, chunk_size: int) -> dict:
+    try:
+        return await import_students_file(path, chunk_size)
+    finally:
+        # Pooled connections must be closed before the event loop goes away
+        await models.dispose_engines()
+
+def import_students(args):
+    """Bulk import students and marks from a CSV or XLSX file"""
+    migrations.migrate()
+    report = asyncio.run(_import_students_file(args.path, args.chunk_size))
+    
+    for error in report["errors"]:
+        logger.warning(f"Row {error['row']}: {error['error']}")
+    logger.info(
+        f"Imported {report['imported']} of {report['rows']} students "
+        f"({report['marks']} marks, {report['failed']} failed) "
+        f"in {report['seconds']}s - {report['rows_per_second']} rows/sec"
+    )
+
+def rebuild_search_index(args):
+    """Drop and refill the full-text student search index"""
+    migrations.migrate()
+    start = time.perf_counter()
+    create_search_index(rebuild=True)
+    logger.info(f"Rebuilt search index in {time.perf_counter() - start:.2f}s")
+
+def compress_static(args):
+    """Write precompressed .gz / .br copies of the files under static/"""
+    written = compress_static_files()
+    for path in written:
+        logger.info(f"Wrote {path}")
+    logger.info(f"Compressed {len(written)} files")
+
+def generate_students(args):
+    """Insert deterministic synthetic students and marks for load testing"""
+    migrations.migrate()
+
+    def progress(report):
+        logger.info(f"{report['students'] + report['skipped'] + report['conflicts']} of {args.count} students done")
+
+    report = datagen.generate_students(
+        args.count, seed=args.seed, chunk_size=args.chunk_size,
+        start=args.start, prefix=args.prefix, progress=progress
+    )
+    logger.info(
+        f"Generated {report['students']} students ({report['marks']} marks, "
+        f"{report['skipped']} already existed) in {report['seconds']}s - "
+        f"{report['students_per_second']} students/sec"
+    )
+    if report["conflicts"]:
+        logger.warning(
+            f"Skipped {report['conflicts']} students whose identifiers or Aadhar number "
+            f"belong to other students; try another --prefix"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Student portal management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help=migrate.__doc__)
+    migrate_parser.set_defaults(func=migrate)
+
+    admin_parser = subparsers.add_parser("grant-admin", help=grant_admin.__doc__)
+    admin_parser.add_argument("username")
+    admin_parser.add_argument("--revoke", action="store_true", help="Take admin rights away instead")
+    admin_parser.set_defaults(func=grant_admin)
+
+    rebuild_parser = subparsers.add_parser("rebuild-summaries", help=rebuild_summaries.__doc__)
+    rebuild_parser.set_defaults(func=rebuild_summaries)
+
+    import_parser = subparsers.add_parser("import-students", help=import_students.__doc__)
+    import_parser.add_argument("path", help="CSV or XLSX file")
+    import_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    import_parser.set_defaults(func=import_students)
+
+    search_parser = subparsers.add_parser("rebuild-search-index", help=rebuild_search_index.__doc__)
+    search_parser.set_defaults(func=rebuild_search_index)
+
+    static_parser = subparsers.add_parser("compress-static", help=compress_static.__doc__)
+    static_parser.set_defaults(func=compress_static)
+
+    generate_parser = subparsers.add_parser("generate-students", help=generate_students.__doc__)
+    generate_parser.add_argument("--count", type=int, required=True)
+    generate_parser.add_argument("--seed", type=int, default=datagen.DEFAULT_SEED)
+    generate_parser.add_argument("--chunk-size", type=int, default=datagen.DEFAULT_CHUNK_SIZE)
+    generate_parser.add_argument("--start", type=int, default=1, help="Index of the first student")
+    generate_parser.add_argument("--prefix", default=datagen.DEFAULT_PREFIX, help="Prefix of the generated identifiers")
+    generate_parser.set_defaults(func=generate_students)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Request and Query Metrics
+Latency histograms, per-request query counts and a Prometheus text endpoint.
+
+MetricsMiddleware times every request and labels it with the route template
+(e.g. /api/student/{identifier}), so one histogram covers every student.
+SQLAlchemy cursor events count the queries and database time of the request
+they run in, and rendering.py reports template render time the same way, so
+a slow request can be split into database, template and everything else
+(bcrypt, serialization, the event loop).
+
+GET /metrics returns everything in the Prometheus text format, together with
+the password hashing, teacher cache, identifier cache and response cache
+counters. Metrics are off by default, and the endpoint is only served to
+requests with "Authorization: Bearer <METRICS_TOKEN>"; without a token nobody
+can read it. With METRICS_LOG_REQUESTS=True each request also writes one JSON
+log line to the "metrics" logger.
+"""
+
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+METRICS_LOG_REQUESTS = os.getenv("METRICS_LOG_REQUESTS", "False").lower() == "true"
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>" (empty = not served)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+logger = logging.getLogger("metrics")
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+        yield float("inf"), self.count
+
+class RequestMetrics:
+    """What one request spent its time on"""
+    __slots__ = ("queries", "db_seconds", "template_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+current_request = ContextVar("current_request", default=None)
+
+# Keyed by (method, route)
+request_latency = {}
+request_queries = {}
+request_db_time = {}
+request_template_time = {}
+# Keyed by (method, route, status)
+request_counts = {}
+query_latency = Histogram(LATENCY_BUCKETS)
+template_latency = {}  # Keyed by template name
+
+def _observe(histograms: dict, key, value: float, buckets=LATENCY_BUCKETS):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram(buckets)
+    histogram.observe(value)
+
+def observe_template(name: str, seconds: float):
+    """Record one template render (called by rendering.py)"""
+    _observe(template_latency, name, seconds)
+    request = current_request.get()
+    if request is not None:
+        request.template_seconds += seconds
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    query_latency.observe(elapsed)
+    request = current_request.get()
+    if request is not None:
+        request.queries += 1
+        request.db_seconds += elapsed
+
+def instrument_engine(engine):
+    """Time every statement run on a sync Engine (use .sync_engine for async engines)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and per-request DB / template time"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    def _route_path(self, scope) -> str:
+        # Routing stores the matched endpoint in the scope; map it back to its path template
+        if self._route_paths is None:
+            router = scope["app"].router
+            self._route_paths = {
+                getattr(route, "endpoint", None) or getattr(route, "app", None): route.path
+                for route in router.routes
+            }
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]  # Mounts rewrite the scope's path
+        request = RequestMetrics()
+        token = current_request.set(request)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route = self._route_path(scope)
+            key = (scope["method"], route)
+            _observe(request_latency, key, elapsed)
+            _observe(request_queries, key, request.queries, QUERY_COUNT_BUCKETS)
+            _observe(request_db_time, key, request.db_seconds)
+            _observe(request_template_time, key, request.template_seconds)
+            count_key = (scope["method"], route, str(status_code))
+            request_counts[count_key] = request_counts.get(count_key, 0) + 1
+
+            if METRICS_LOG_REQUESTS:
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "path": path,
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "queries": request.queries,
+                    "db_ms": round(request.db_seconds * 1000, 2),
+                    "template_ms": round(request.template_seconds * 1000, 2)
+                }))
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+def _histogram_lines(name: str, help_text: str, histograms: dict, label_names) -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        for bound, count in histogram.cumulative():
+            lines.append(f"{name}_bucket{_labels(**labels, le=_format_bound(bound))} {count}")
+        lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+def _cache_lines(caches: dict) -> list:
+    """Hit / miss counters and sizes of caches that report TTLCache-style stats"""
+    lines = [
+        "# HELP student_portal_cache_hits_total Cache lookups that found an entry",
+        "# TYPE student_portal_cache_hits_total counter",
+    ]
+    lines += [f"student_portal_cache_hits_total{_labels(cache=name)} {stats['hits']}" for name, stats in caches.items()]
+    lines += [
+        "# HELP student_portal_cache_misses_total Cache lookups that found nothing",
+        "# TYPE student_portal_cache_misses_total counter",
+    ]
+    lines += [f"student_portal_cache_misses_total{_labels(cache=name)} {stats['misses']}" for name, stats in caches.items()]
+    lines += [
+        "# HELP student_portal_cache_entries Entries currently cached",
+        "# TYPE student_portal_cache_entries gauge",
+    ]
+    lines += [
+        f"student_portal_cache_entries{_labels(cache=name)} {stats['size']}"
+        for name, stats in caches.items() if "size" in stats
+    ]
+    return lines
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    from auth import get_password_hash_stats, get_teacher_cache_stats, password_hash_stats
+    from models import student_identifier_cache
+    from response_cache import response_cache
+
+    lines = [
+        "# HELP student_portal_requests_total HTTP requests by route and status",
+        "# TYPE student_portal_requests_total counter",
+    ]
+    for (method, route, status_code), count in sorted(request_counts.items()):
+        lines.append(f"student_portal_requests_total{_labels(method=method, route=route, status=status_code)} {count}")
+
+    label_names = ("method", "route")
+    lines += _histogram_lines("student_portal_request_duration_seconds",
+                              "Time from request to last response byte", request_latency, label_names)
+    lines += _histogram_lines("student_portal_request_queries",
+                              "SQL statements run per request", request_queries, label_names)
+    lines += _histogram_lines("student_portal_request_db_seconds",
+                              "Time spent in SQL statements per request", request_db_time, label_names)
+    lines += _histogram_lines("student_portal_request_template_seconds",
+                              "Time spent rendering templates per request", request_template_time, label_names)
+    lines += _histogram_lines("student_portal_query_duration_seconds",
+                              "Duration of each SQL statement", {(): query_latency}, ())
+    lines += _histogram_lines("student_portal_template_render_seconds",
+                              "Duration of each top-level template render", template_latency, ("template",))
+
+    response_stats = response_cache.stats()
+    caches = {
+        "teacher": get_teacher_cache_stats(),
+        "student_identifier": student_identifier_cache.stats(),
+        "response": response_stats,
+        "fragment": {"hits": response_stats["fragment_hits"], "misses": response_stats["fragment_misses"]},
+    }
+    lines += _cache_lines(caches)
+    lines += [
+        "# HELP student_portal_not_modified_total Conditional GETs answered with 304",
+        "# TYPE student_portal_not_modified_total counter",
+        f"student_portal_not_modified_total {response_stats['not_modified']}",
+    ]
+
+    password_stats = get_password_hash_stats()
+    lines += [
+        "# HELP student_portal_password_hash_calls_total bcrypt hash / verify calls",
+        "# TYPE student_portal_password_hash_calls_total counter",
+        f"student_portal_password_hash_calls_total {password_stats['calls']}",
+        "# HELP student_portal_password_hash_rejected_total bcrypt calls rejected because the queue was full",
+        "# TYPE student_portal_password_hash_rejected_total counter",
+        f"student_portal_password_hash_rejected_total {password_stats['rejected']}",
+        "# HELP student_portal_password_hash_seconds_total Time spent in bcrypt calls, including queue wait",
+        "# TYPE student_portal_password_hash_seconds_total counter",
+        f"student_portal_password_hash_seconds_total {password_hash_stats['total_seconds']}",
+        "# HELP student_portal_password_hash_in_flight bcrypt calls running or queued",
+        "# TYPE student_portal_password_hash_in_flight gauge",
+        f"student_portal_password_hash_in_flight {password_stats['in_flight']}",
+    ]
+    return "\n".join(lines) + "\n"
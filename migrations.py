@@ -0,0 +1,103 @@
+"""
+Schema Migrations
+Versioned schema changes, applied with `python manage.py migrate`.
+
+The schema_version table records every migration a database has had. At
+startup the app only reads the highest version from it (one indexed query)
+instead of running create_tables, which reflects every table, checks every
+index and scans the students table for missing identifier and summary rows.
+
+A database that is behind the code stops the app with a message to run the
+migrations, unless AUTO_MIGRATE is on (the default with DEBUG=True), in which
+case startup applies them. A database ahead of the code (an older release
+started against a migrated database) always stops it.
+
+To change the schema, append a (version, description, function) entry to
+MIGRATIONS. Migrations must be safe to re-run if interrupted; never edit or
+reorder ones that have been released.
+"""
+
+import logging
+import os
+
+from sqlalchemy import func, inspect, insert, select, text
+
+import models
+from models import SchemaVersion
+from search import create_search_index, sqlite_fts_is_external_content
+
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", os.getenv("DEBUG", "False")).lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+def add_teacher_is_admin():
+    # Databases created after the column was added to the model already have it
+    columns = {column["name"] for column in inspect(models.engine).get_columns("teachers")}
+    if "is_admin" not in columns:
+        with models.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE teachers ADD COLUMN is_admin BOOLEAN NOT NULL DEFAULT 0"))
+
+def external_content_search_index():
+    # students_fts used to keep its own copy of the columns, and its triggers
+    # found rows to delete by scanning the whole index for the reg_no
+    if models.engine.dialect.name != "sqlite":
+        return
+    with models.engine.connect() as connection:
+        current = sqlite_fts_is_external_content(connection)
+    if not current:
+        create_search_index(rebuild=True)
+
+# (version, description, function), in the order they are applied
+MIGRATIONS = [
+    # Brings any database, empty or created by an unversioned release, up to date
+    (1, "Baseline: tables, indexes, identifier / summary backfills and search index", models.create_tables),
+    (2, "teachers.is_admin", add_teacher_is_admin),
+    (3, "External-content students_fts, synced by rowid", external_content_search_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+class SchemaOutOfDate(RuntimeError):
+    """The database schema doesn't match the version this code expects"""
+
+def schema_version() -> int:
+    """Highest migration applied to the database (0 for a new or unversioned one)"""
+    with models.engine.connect() as connection:
+        if not inspect(connection).has_table(SchemaVersion.__tablename__):
+            return 0
+        return connection.scalar(select(func.max(SchemaVersion.version))) or 0
+
+def migrate() -> list:
+    """
+    Apply every pending migration, recording each one once it has finished.
+
+    Returns:
+        Versions applied (empty if the schema was already current)
+    """
+    version = schema_version()
+    applied = []
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        logger.info(f"Applying migration {number}: {description}")
+        apply()  # The baseline's create_all also creates schema_version
+        with models.engine.begin() as connection:
+            connection.execute(insert(SchemaVersion).values(version=number, description=description))
+        applied.append(number)
+    return applied
+
+def check_schema(auto_migrate: bool = AUTO_MIGRATE):
+    """Startup check: make sure the database matches the code, migrating if allowed"""
+    version = schema_version()
+    if version > LATEST_VERSION:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version}, newer than this code's {LATEST_VERSION}; "
+            "deploy the matching release"
+        )
+    if version < LATEST_VERSION:
+        if not auto_migrate:
+            raise SchemaOutOfDate(
+                f"Database schema is at version {version}, this code needs {LATEST_VERSION}. "
+                "Run: python manage.py migrate"
+            )
+        migrate()
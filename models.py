@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, create_engine
+from sqlalchemy import make_url, Column, Integer, String, ForeignKey, Float, Boolean, DateTime, Index, create_engine, event, select, insert, delete, exists, inspect, case, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import Session, relationship, sessionmaker, selectinload
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
 import os
+import random
 from datetime import datetime
 from dotenv import load_dotenv
+from cache import TTLCache
 
 load_dotenv()
 
@@ -13,6 +20,7 @@ USE_SQLITE = os.getenv("USE_SQLITE", "True").lower() == "true"
 
 if USE_SQLITE:
     DATABASE_URL = "sqlite:///./student_portal.db"
+    ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./student_portal.db"
 else:
     # MySQL configuration (optional)
     DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -21,9 +29,116 @@ else:
     DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
     DB_NAME = os.getenv("DB_NAME", "student_portal")
     DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    ASYNC_DATABASE_URL = f"mysql+asyncmy://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL)
+# Read replicas - comma-separated async URLs (e.g. mysql+asyncmy://user:pw@replica1/student_portal).
+# Read-only handlers query a replica; everything else uses the primary above.
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+# How long reads of a just-written student stay on the primary (should exceed replication lag)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+# Connection pools (each engine gets its own)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # MySQL drops idle connections
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+
+# SQLite tuning, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # WAL: readers don't wait for writers
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable enough with WAL
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Identifier -> reg_no resolver cache
+STUDENT_ID_CACHE_SIZE = int(os.getenv("STUDENT_ID_CACHE_SIZE", "10000"))
+STUDENT_ID_CACHE_TTL_SECONDS = float(os.getenv("STUDENT_ID_CACHE_TTL_SECONDS", "300"))
+
+# Marking scheme
+MAX_MARKS_PER_SUBJECT = 50  # Each internal is marked out of 50
+CGPA_DIVISOR = 9.5  # CGPA cutoff = percentage / 9.5
+
+def sqlite_pragmas(journal_mode: str = SQLITE_JOURNAL_MODE) -> list:
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+    ]
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in sqlite_pragmas():
+        cursor.execute(pragma)
+    cursor.close()
+
+if USE_SQLITE:
+    ENGINE_OPTIONS = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    # aiosqlite defaults to NullPool, which opens a new connection (and thread) per session
+    ASYNC_ENGINE_OPTIONS = {**ENGINE_OPTIONS, "poolclass": AsyncAdaptedQueuePool}
+else:
+    ENGINE_OPTIONS = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    ASYNC_ENGINE_OPTIONS = ENGINE_OPTIONS
+
+# Synchronous engine - used by scripts (setup_database.py) and create_tables
+engine = create_engine(DATABASE_URL, **ENGINE_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine - used by request handlers so queries don't block the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **ASYNC_ENGINE_OPTIONS)
+
+replica_engines = [
+    create_async_engine(url, **(
+        {**ENGINE_OPTIONS, "poolclass": AsyncAdaptedQueuePool}
+        if make_url(url).get_backend_name() == "sqlite" else ENGINE_OPTIONS
+    ))
+    for url in DB_REPLICA_URLS
+]
+
+# Every Engine that runs statements (async engines run them on their sync_engine)
+sync_engines = [engine, async_engine.sync_engine] + [replica.sync_engine for replica in replica_engines]
+
+for sync_engine in sync_engines:
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+
+class RoutingSession(Session):
+    """
+    Sends reads of read-only sessions to a replica and everything else to the primary.
+    
+    A session is read-only when session.info["read_only"] is set (see
+    get_read_db). Flushes and INSERT/UPDATE/DELETE statements always go to
+    the primary, and once a session has written, its later reads follow.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not replica_engines or not self.info.get("read_only"):
+            return super().get_bind(mapper, clause=clause, **kw)
+        
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["read_only"] = False
+            return async_engine.sync_engine
+        
+        # One replica per session, so a request never mixes replicas with different lag
+        if "replica" not in self.info:
+            self.info["replica"] = random.choice(replica_engines).sync_engine
+        return self.info["replica"]
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 class Teacher(Base):
@@ -33,9 +148,16 @@ class Teacher(Base):
     username = Column(String(50), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     name = Column(String(100), nullable=False)
+    # Granted with `python manage.py grant-admin`; signup never sets it
+    is_admin = Column(Boolean, nullable=False, default=False, server_default="0")
 
 class Student(Base):
     __tablename__ = "students"
+    __table_args__ = (
+        # Keyset pagination when listing students sorted by name / admission year
+        Index("ix_students_name_reg_no", "name", "reg_no"),
+        Index("ix_students_admission_year_reg_no", "admission_year", "reg_no"),
+    )
     
     reg_no = Column(String(20), primary_key=True, index=True)
     umis_id = Column(String(20), unique=True, index=True, nullable=False)
@@ -47,10 +169,17 @@ class Student(Base):
     admission_year = Column(Integer, nullable=False)  # Year of admission (e.g., 2023)
     
     # Relationship with marks
-    marks = relationship("Mark", back_populates="student")
+    marks = relationship("Mark", back_populates="student", order_by="[Mark.semester, Mark.id]")
+    semester_summaries = relationship("SemesterSummary", viewonly=True, order_by="SemesterSummary.semester")
 
 class Mark(Base):
     __tablename__ = "marks"
+    __table_args__ = (
+        # One row per subject per semester; also serves (student_id, semester) lookups
+        Index("uq_marks_student_semester_subject", "student_id", "semester", "subject_code", unique=True),
+        # Covering index for per-subject analytics (see analytics.py)
+        Index("ix_marks_semester_subject_internals", "semester", "subject_code", "internal_1", "internal_2"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(String(20), ForeignKey("students.reg_no"), nullable=False)
@@ -60,25 +189,413 @@ class Mark(Base):
     internal_1 = Column(Float, nullable=False, default=0)
     internal_2 = Column(Float, nullable=False, default=0)
     
-    # Computed field - best of two internals
-    @property
+    # Computed field - best of two internals (also usable in SQL queries)
+    @hybrid_property
     def best_of_two(self):
         return max(self.internal_1, self.internal_2)
     
+    @best_of_two.expression
+    def best_of_two(cls):
+        return case((cls.internal_1 >= cls.internal_2, cls.internal_1), else_=cls.internal_2)
+    
     # Relationship with student
     student = relationship("Student", back_populates="marks")
+    
+    # Aggregates for this mark's semester (see refresh_semester_summaries)
+    semester_summary = relationship(
+        "SemesterSummary",
+        primaryjoin="and_(foreign(Mark.student_id) == SemesterSummary.student_id, "
+                    "foreign(Mark.semester) == SemesterSummary.semester)",
+        viewonly=True,
+        uselist=False
+    )
+
+class SemesterSummary(Base):
+    """Per-student semester totals, recomputed whenever that semester's marks are written"""
+    __tablename__ = "semester_summaries"
+    __table_args__ = (
+        # Rankings within a semester (toppers, percentiles)
+        Index("ix_semester_summaries_semester_percentage", "semester", "percentage"),
+    )
+    
+    student_id = Column(String(20), ForeignKey("students.reg_no"), primary_key=True)
+    semester = Column(Integer, primary_key=True)
+    subject_count = Column(Integer, nullable=False)
+    total_marks = Column(Float, nullable=False)
+    max_marks = Column(Integer, nullable=False)
+    percentage = Column(Float, nullable=False)
+    cgpa_cutoff = Column(Float, nullable=False)
+
+class StudentIdentifier(Base):
+    """Maps every reg_no, UMIS ID and EMIS ID to the owning student's reg_no"""
+    __tablename__ = "student_identifiers"
+    
+    identifier = Column(String(20), primary_key=True)
+    reg_no = Column(String(20), ForeignKey("students.reg_no"), nullable=False, index=True)
+
+class SchemaVersion(Base):
+    """Migrations applied to this database, one row per version (see migrations.py)"""
+    __tablename__ = "schema_version"
+    
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+student_identifier_cache = TTLCache(maxsize=STUDENT_ID_CACHE_SIZE, ttl=STUDENT_ID_CACHE_TTL_SECONDS)
+
+def _student_identifiers(student) -> set:
+    return {student.reg_no, student.umis_id, student.emis_id}
+
+def student_identifier_rows(students) -> list:
+    """student_identifiers rows for students written with bulk inserts, which skip the mapper events"""
+    return [
+        {"identifier": identifier, "reg_no": student["reg_no"]}
+        for student in students
+        for identifier in {student["reg_no"], student["umis_id"], student["emis_id"]}
+    ]
+
+def _forget_identifiers(identifiers):
+    for identifier in identifiers:
+        student_identifier_cache.pop(identifier)
+
+# Keep student_identifiers in step with every write to students
+@event.listens_for(Student, "after_insert")
+def _add_student_identifiers(mapper, connection, target):
+    connection.execute(insert(StudentIdentifier), [
+        {"identifier": identifier, "reg_no": target.reg_no}
+        for identifier in _student_identifiers(target)
+    ])
+
+@event.listens_for(Student, "after_update")
+def _update_student_identifiers(mapper, connection, target):
+    state = inspect(target)
+    old_identifiers = set()
+    for attr in ("reg_no", "umis_id", "emis_id"):
+        old_identifiers.update(state.attrs[attr].history.deleted)
+    if not old_identifiers:
+        return
+    
+    connection.execute(delete(StudentIdentifier).where(
+        StudentIdentifier.identifier.in_(old_identifiers | _student_identifiers(target))
+    ))
+    _add_student_identifiers(mapper, connection, target)
+    _forget_identifiers(old_identifiers)
+
+@event.listens_for(Student, "before_delete")
+def _remove_student_identifiers(mapper, connection, target):
+    connection.execute(delete(StudentIdentifier).where(StudentIdentifier.reg_no == target.reg_no))
+    _forget_identifiers(_student_identifiers(target))
 
 # Database session dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def dispose_engines():
+    """Close pooled async connections; call before the event loop shuts down"""
+    for pooled_engine in [async_engine] + replica_engines:
+        await pooled_engine.dispose()
+
+def read_session():
+    """A session whose reads may be served by a replica"""
+    session = AsyncSessionLocal()
+    session.info["read_only"] = True
+    return session
+
+async def get_read_db():
+    """get_db for handlers that only read"""
+    async with read_session() as db:
+        yield db
+
+# Students written in the last REPLICA_STICKY_SECONDS, by every identifier
+primary_pins = TTLCache(maxsize=STUDENT_ID_CACHE_SIZE, ttl=REPLICA_STICKY_SECONDS)
+
+def pin_to_primary(students):
+    """Read-your-writes: serve these students from the primary until replicas catch up"""
+    if replica_engines:
+        for student in students:
+            for identifier in _student_identifiers(student):
+                primary_pins.set(identifier, True)
+
+def use_primary_for(db, identifier: str):
+    """Switch a read session to the primary if this student was written recently"""
+    if primary_pins.get(identifier):
+        db.info["read_only"] = False
 
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    remove_duplicate_marks()
+    create_missing_indexes()
+    backfill_student_identifiers()
+    backfill_semester_summaries()
+    
+    from search import create_search_index
+    create_search_index()
+
+def create_missing_indexes():
+    """
+    Add indexes declared on the models to tables that already exist.
+    
+    create_all only creates indexes together with a new table, so databases
+    created by an older create_tables would otherwise never get them.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def remove_duplicate_marks():
+    """
+    Keep only the newest mark per (student, semester, subject) so the unique
+    index can be added to databases created before it existed.
+    """
+    existing_indexes = {index["name"] for index in inspect(engine).get_indexes("marks")}
+    if "uq_marks_student_semester_subject" in existing_indexes:
+        return
+    
+    with engine.begin() as connection:
+        # The derived table lets MySQL read from the table it is deleting from
+        removed = connection.execute(text("""
+            DELETE FROM marks WHERE id NOT IN (
+                SELECT id FROM (
+                    SELECT MAX(id) AS id FROM marks
+                    GROUP BY student_id, semester, subject_code
+                ) AS latest
+            )
+        """)).rowcount
+    if removed:
+        rebuild_semester_summaries()
+
+def backfill_student_identifiers():
+    """Add student_identifiers rows for students created before the table existed"""
+    with engine.begin() as connection:
+        for column in (Student.reg_no, Student.umis_id, Student.emis_id):
+            missing = select(column, Student.reg_no).where(
+                ~exists().where(StudentIdentifier.identifier == column)
+            )
+            connection.execute(
+                insert(StudentIdentifier)
+                .from_select(["identifier", "reg_no"], missing)
+                .prefix_with("OR IGNORE", dialect="sqlite")
+                .prefix_with("IGNORE", dialect="mysql")
+            )
+
+def semester_summary_statements(student_ids=None, semesters=None):
+    """Build the delete + INSERT ... SELECT pair that recomputes semester_summaries rows"""
+    subject_count = func.count(Mark.id)
+    total_marks = func.sum(Mark.best_of_two)
+    max_marks = subject_count * MAX_MARKS_PER_SUBJECT
+    percentage = total_marks * 100.0 / max_marks
+    
+    aggregates = select(
+        Mark.student_id, Mark.semester, subject_count, total_marks,
+        max_marks, percentage, percentage / CGPA_DIVISOR
+    ).group_by(Mark.student_id, Mark.semester)
+    clear = delete(SemesterSummary)
+    
+    if student_ids is not None:
+        aggregates = aggregates.where(Mark.student_id.in_(student_ids))
+        clear = clear.where(SemesterSummary.student_id.in_(student_ids))
+    if semesters is not None:
+        aggregates = aggregates.where(Mark.semester.in_(semesters))
+        clear = clear.where(SemesterSummary.semester.in_(semesters))
+    
+    fill = insert(SemesterSummary).from_select(
+        ["student_id", "semester", "subject_count", "total_marks",
+         "max_marks", "percentage", "cgpa_cutoff"],
+        aggregates
+    )
+    return clear, fill
+
+async def refresh_semester_summaries(db, student_ids, semesters=None):
+    """
+    Recompute semester_summaries for the given students inside the caller's transaction.
+    
+    Call this after any write to marks and before committing.
+    
+    Args:
+        db: Async database session
+        student_ids: reg_no values whose marks changed
+        semesters: Limit the refresh to these semesters (defaults to all)
+    """
+    await db.flush()
+    student_ids = list(set(student_ids))
+    if semesters is not None:
+        semesters = list(set(semesters))
+    for statement in semester_summary_statements(student_ids, semesters):
+        await db.execute(statement)
+
+MARK_VALUE_FIELDS = ("subject_name", "internal_1", "internal_2")
+
+async def upsert_marks(db, rows):
+    """Insert or update marks keyed on (student_id, semester, subject_code) in one batched statement"""
+    if not rows:
+        return
+    
+    if db.get_bind().dialect.name == "mysql":
+        # Only MySQL deployments pay for importing its dialect
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        statement = mysql_insert(Mark.__table__)
+        statement = statement.on_duplicate_key_update(
+            {field: statement.inserted[field] for field in MARK_VALUE_FIELDS}
+        )
+    else:
+        statement = sqlite_insert(Mark.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=["student_id", "semester", "subject_code"],
+            set_={field: statement.excluded[field] for field in MARK_VALUE_FIELDS}
+        )
+    await db.execute(statement, rows)
+
+async def save_marks(db, rows, replace_semesters: bool = False) -> dict:
+    """
+    Write marks as a diff against what is already stored.
+    
+    Only new or changed rows are written (as one upsert batch), so unchanged
+    rows keep their ids. Semester summaries are refreshed in the same
+    transaction; the caller commits.
+    
+    Args:
+        db: Async database session
+        rows: Dicts with student_id, semester, subject_code, subject_name, internal_1, internal_2
+        replace_semesters: Also delete stored marks in each touched (student, semester)
+            whose subject is not in rows
+    
+    Returns:
+        Counts of inserted, updated, unchanged and deleted rows
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    if not rows:
+        return counts
+    
+    student_ids = list({row["student_id"] for row in rows})
+    semesters = list({row["semester"] for row in rows})
+    result = await db.execute(
+        select(Mark.id, Mark.student_id, Mark.semester, Mark.subject_code,
+               Mark.subject_name, Mark.internal_1, Mark.internal_2)
+        .where(Mark.student_id.in_(student_ids), Mark.semester.in_(semesters))
+    )
+    stored = {(mark.student_id, mark.semester, mark.subject_code): mark for mark in result}
+    
+    changed = []
+    incoming_keys = set()
+    for row in rows:
+        key = (row["student_id"], row["semester"], row["subject_code"])
+        incoming_keys.add(key)
+        current = stored.get(key)
+        if current is None:
+            counts["inserted"] += 1
+            changed.append(row)
+        elif any(getattr(current, field) != row[field] for field in MARK_VALUE_FIELDS):
+            counts["updated"] += 1
+            changed.append(row)
+        else:
+            counts["unchanged"] += 1
+    
+    stale_ids = []
+    if replace_semesters:
+        touched = {key[:2] for key in incoming_keys}
+        stale_ids = [
+            mark.id for key, mark in stored.items()
+            if key not in incoming_keys and key[:2] in touched
+        ]
+    
+    await upsert_marks(db, changed)
+    if stale_ids:
+        await db.execute(delete(Mark).where(Mark.id.in_(stale_ids)))
+        counts["deleted"] = len(stale_ids)
+    if changed or stale_ids:
+        await refresh_semester_summaries(db, student_ids, semesters)
+    return counts
+
+def rebuild_semester_summaries():
+    """Recompute semester_summaries for every student from the marks table"""
+    with engine.begin() as connection:
+        for statement in semester_summary_statements():
+            connection.execute(statement)
+
+def backfill_semester_summaries():
+    """Build semester_summaries for databases that have marks but no summaries yet"""
+    with engine.connect() as connection:
+        has_marks = connection.execute(select(exists().select_from(Mark))).scalar()
+        has_summaries = connection.execute(select(exists().select_from(SemesterSummary))).scalar()
+    if has_marks and not has_summaries:
+        rebuild_semester_summaries()
+
+# Student lookups
+async def resolve_student(db, identifier: str):
+    """
+    Find a student by Registration Number, UMIS ID or EMIS ID.
+    
+    Resolves through the student_identifiers primary key (or the in-memory
+    resolver cache), so each lookup is a single indexed point read.
+    
+    Args:
+        db: Async database session
+        identifier: reg_no, umis_id or emis_id
+    
+    Returns:
+        The Student, or None if no student has this identifier
+    """
+    reg_no = student_identifier_cache.get(identifier)
+    if reg_no is not None:
+        student = await db.get(Student, reg_no)
+        if student is None:
+            student_identifier_cache.pop(identifier)
+        return student
+    
+    student = await db.scalar(
+        select(Student)
+        .join(StudentIdentifier, StudentIdentifier.reg_no == Student.reg_no)
+        .where(StudentIdentifier.identifier == identifier)
+    )
+    if student is not None:
+        student_identifier_cache.set(identifier, student.reg_no)
+    return student
+
+async def resolve_reg_no(db, identifier: str):
+    """Map a reg_no / UMIS ID / EMIS ID to the owning student's reg_no without loading the student"""
+    reg_no = student_identifier_cache.get(identifier)
+    if reg_no is None:
+        reg_no = await db.scalar(
+            select(StudentIdentifier.reg_no).where(StudentIdentifier.identifier == identifier)
+        )
+        if reg_no is not None:
+            student_identifier_cache.set(identifier, reg_no)
+    return reg_no
+
+async def resolve_students(db, identifiers, with_summaries: bool = False) -> dict:
+    """
+    Batch version of resolve_student.
+    
+    Resolves any mix of reg_no / UMIS / EMIS identifiers with one IN query
+    (plus one more for semester_summaries when requested), however many
+    identifiers are passed.
+    
+    Returns:
+        Dictionary mapping each identifier that was found to its Student
+    """
+    identifiers = list(set(identifiers))
+    if not identifiers:
+        return {}
+    
+    query = (
+        select(StudentIdentifier.identifier, Student)
+        .join(Student, Student.reg_no == StudentIdentifier.reg_no)
+        .where(StudentIdentifier.identifier.in_(identifiers))
+    )
+    if with_summaries:
+        query = query.options(selectinload(Student.semester_summaries))
+    
+    result = await db.execute(query)
+    return {identifier: student for identifier, student in result.all()}
+
+async def find_taken_identifiers(db, identifiers) -> set:
+    """Return which of the given identifiers already belong to some student"""
+    result = await db.execute(
+        select(StudentIdentifier.identifier).where(StudentIdentifier.identifier.in_(list(set(identifiers))))
+    )
+    return set(result.scalars().all())
 
 # Utility functions for semester calculation
 def calculate_current_semester(admission_year: int, current_date: datetime = None) -> int:
@@ -116,6 +633,31 @@ def calculate_current_semester(admission_year: int, current_date: datetime = Non
     # Cap at 6 semesters (3 years)
     return min(total_semester, 6)
 
+def admission_years_for_semester(semester: int, current_date: datetime = None):
+    """
+    Inverse of calculate_current_semester: which admission years are in a semester now.
+    
+    Args:
+        semester: Semester (1-6)
+        current_date: Current date (defaults to now)
+    
+    Returns:
+        (earliest, latest) admission year, inclusive. earliest is None for
+        semester 6, which also covers every graduated batch. Returns None if
+        no batch can be in that semester at this time of year.
+    """
+    if current_date is None:
+        current_date = datetime.now()
+    
+    # Anyone admitted more than 4 years ago is capped at semester 6
+    years = [
+        year for year in range(current_date.year - 4, current_date.year + 2)
+        if calculate_current_semester(year, current_date) == semester
+    ]
+    if not years:
+        return None
+    return (None if semester == 6 else min(years), max(years))
+
 def get_graduation_year(admission_year: int) -> int:
     """Get graduation year based on admission year (3-year course)"""
     return admission_year + 3
@@ -150,3 +692,13 @@ def get_academic_year_info(admission_year: int, current_date: datetime = None) -
         'total_semesters': 6,
         'available_semesters': list(range(1, current_semester + 1))
     }
+
+def duplicate_subject_error(marks):
+    """Error message if a subject appears twice in one semester (the marks unique index), else None"""
+    seen = set()
+    for mark in marks:
+        key = (mark["semester"], mark["subject_code"])
+        if key in seen:
+            return f"Subject {key[1]} appears more than once for semester {key[0]}"
+        seen.add(key)
+    return None
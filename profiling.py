@@ -0,0 +1,184 @@
+"""
+Request Profiler
+On-demand sampling profiles of single requests, for admins.
+
+With PROFILING_ENABLED=True, a request that carries an "X-Profile: 1" header
+or a "profile=1" query parameter, from a teacher listed in PROFILE_ADMINS
+(empty by default) whose account is an admin (granted with `python manage.py
+grant-admin <username>`), runs under pyinstrument's sampling profiler (in
+async mode, so time spent awaiting the database is attributed to the
+awaiting line). Each profile is stored in PROFILE_DIR as an interactive HTML
+flamegraph and a speedscope file (open it at https://www.speedscope.app), and
+listed on /admin/profiles. The response carries an X-Profile-Url header
+pointing at it.
+
+Every other request only pays for a header / query string check, and with
+PROFILING_ENABLED=False the middleware is not installed at all.
+
+Requires pyinstrument (pip install pyinstrument).
+"""
+
+import json
+import os
+import re
+import time
+from urllib.parse import parse_qs
+
+import anyio
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers
+
+from auth import teacher_from_token
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+PROFILE_ADMINS = {name.strip() for name in os.getenv("PROFILE_ADMINS", "").split(",") if name.strip()}
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))  # Oldest profiles are deleted beyond this
+
+PROFILE_URL = "/admin/profiles"
+PROFILE_NAME = re.compile(r"^[\w.-]+\.(html|speedscope\.json)$")
+UNSAFE_PATH_CHARACTERS = re.compile(r"[^A-Za-z0-9]+")
+
+def _request_token(headers: Headers) -> str:
+    authorization = headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    # Web pages authenticate with the cookie set at login
+    for cookie in headers.get("cookie", "").split(";"):
+        name, _, value = cookie.strip().partition("=")
+        if name == "access_token":
+            return value
+    return ""
+
+async def profile_admin(headers: Headers):
+    """Username of the requesting admin, or None if the request isn't from one"""
+    if not PROFILE_ADMINS:
+        return None
+    # Being listed isn't enough: anyone could sign up under a listed name that has no account yet
+    teacher = await teacher_from_token(_request_token(headers))
+    if teacher is None or not teacher.is_admin or teacher.username not in PROFILE_ADMINS:
+        return None
+    return teacher.username
+
+async def require_profile_admin(request) -> str:
+    """Route guard for the profile pages"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    username = await profile_admin(request.headers)
+    if username is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Profiles are only available to admins")
+    return username
+
+def _wants_profile(scope, headers: Headers) -> bool:
+    if headers.get("x-profile") == "1":
+        return True
+    query_string = scope.get("query_string", b"")
+    return b"profile=" in query_string and parse_qs(query_string.decode()).get("profile") == ["1"]
+
+def _save_profile(profiler, name: str, meta: dict):
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, name)
+    with open(base + ".html", "w", encoding="utf-8") as output:
+        output.write(profiler.output_html())
+    with open(base + ".speedscope.json", "w", encoding="utf-8") as output:
+        output.write(profiler.output(renderer=SpeedscopeRenderer()))
+    with open(base + ".meta.json", "w", encoding="utf-8") as output:
+        json.dump(meta, output)
+    _prune_profiles()
+
+def _prune_profiles():
+    metas = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".meta.json"))
+    for meta in metas[:max(0, len(metas) - PROFILE_MAX_FILES)]:
+        name = meta[:-len(".meta.json")]
+        for suffix in (".meta.json", ".html", ".speedscope.json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, name + suffix))
+            except FileNotFoundError:
+                pass
+
+def list_profiles() -> list:
+    """Stored profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not filename.endswith(".meta.json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, filename), encoding="utf-8") as meta:
+                profiles.append(json.load(meta))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+def profile_path(filename: str) -> str:
+    """Path of a stored profile file; 404 for anything else"""
+    path = os.path.join(PROFILE_DIR, filename)
+    if not PROFILE_NAME.match(filename) or not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return path
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling the requests admins ask to have profiled"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if not _wants_profile(scope, headers):
+            await self.app(scope, receive, send)
+            return
+        username = await profile_admin(headers)
+        if username is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("PROFILING_ENABLED=True requires pyinstrument (pip install pyinstrument)")
+
+        method, path = scope["method"], scope["path"]
+        now = time.time()
+        # Sorts chronologically and stays a safe file name
+        name = (
+            f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+            f"-{method}-{UNSAFE_PATH_CHARACTERS.sub('_', path).strip('_')[:60]}"
+        )
+        status_code = 500
+
+        async def send_with_link(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-url", f"{PROFILE_URL}/{name}.html".encode())
+                ]
+            await send(message)
+
+        profiler = Profiler(interval=PROFILE_INTERVAL_SECONDS, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_link)
+        finally:
+            profiler.stop()
+            meta = {
+                "name": name,
+                "method": method,
+                "path": path,
+                "query": scope.get("query_string", b"").decode(errors="replace"),
+                "status": status_code,
+                "teacher": username,
+                "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
+                "duration_ms": round((time.time() - now) * 1000, 1)
+            }
+            # Rendering the profile takes a while; keep it off the event loop
+            await anyio.to_thread.run_sync(_save_profile, profiler, name, meta)
@@ -0,0 +1,212 @@
+"""
+Query Diagnostics
+Per-request SQL capture, slow-query log, N+1 detection and query budgets.
+
+Meant for development and staging (QUERY_LOG_ENABLED=True); it walks the
+stack for every statement, which costs more than the counters in metrics.py.
+
+For each request QueryLogMiddleware records every statement with its
+duration and the line of application code that ran it, then:
+    - logs statements slower than SLOW_QUERY_MS together with their EXPLAIN plan
+    - flags an N+1 when one statement shape (the SQL with its parameters left
+      out) runs N_PLUS_ONE_THRESHOLD or more times, e.g. a lazy load of
+      student.marks inside a loop over students
+    - reports requests that run more than QUERY_BUDGET statements; with
+      QUERY_BUDGET_STRICT=True they fail with QueryBudgetExceeded instead,
+      so a test suite catches the regression
+    - adds X-Query-Count and Server-Timing headers to the response
+
+Code and tests can also check a block directly:
+
+    with assert_max_queries(3):
+        await client.get("/api/student/REG001")   # httpx.AsyncClient(app=app)
+"""
+
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import greenlet
+from sqlalchemy import event
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "False").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+QUERY_EXPLAIN = os.getenv("QUERY_EXPLAIN", "True").lower() == "true"
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "0"))  # 0 = no budget
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "False").lower() == "true"
+
+THIS_FILE = os.path.abspath(__file__)
+PROJECT_DIR = os.path.dirname(THIS_FILE)
+# IN lists expand to one placeholder per value; treat every length as one shape
+IN_LIST = re.compile(r"\((?:\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*,)*\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*\)")
+WHITESPACE = re.compile(r"\s+")
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "mysql": "EXPLAIN "}
+
+logger = logging.getLogger("querylog")
+
+class QueryBudgetExceeded(AssertionError):
+    """A request or block ran more statements than its budget allows"""
+
+class QueryRecord:
+    __slots__ = ("statement", "parameters", "seconds", "call_site")
+
+    def __init__(self, statement: str, parameters, seconds: float, call_site: str):
+        self.statement = statement
+        self.parameters = parameters
+        self.seconds = seconds
+        self.call_site = call_site
+
+    @property
+    def shape(self) -> str:
+        return IN_LIST.sub("(...)", WHITESPACE.sub(" ", self.statement).strip())
+
+# Every active capture (request, assert_max_queries block) gets each statement
+_collectors = ContextVar("query_collectors", default=())
+
+def _application_frame(frame):
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIR) and filename != THIS_FILE and "site-packages" not in filename:
+            return frame
+        frame = frame.f_back
+    return None
+
+def call_site() -> str:
+    """file:line of the application code that ran the current statement"""
+    # Async sessions run statements in a greenlet; the awaiting code is in its parent
+    frame = _application_frame(sys._getframe(1))
+    current = greenlet.getcurrent()
+    while frame is None and current.parent is not None:
+        current = current.parent
+        frame = _application_frame(current.gr_frame)
+    if frame is None:
+        return "unknown"
+    return f"{os.path.relpath(frame.f_code.co_filename, PROJECT_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+def explain(connection, statement: str, parameters) -> list:
+    """Query plan rows for a SELECT, run on the same DBAPI connection"""
+    prefix = EXPLAIN_PREFIXES.get(connection.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return []
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [tuple(row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [(f"EXPLAIN failed: {e}",)]
+    finally:
+        cursor.close()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("querylog_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["querylog_start"].pop()
+    collectors = _collectors.get()
+    slow = elapsed * 1000 >= SLOW_QUERY_MS
+    if not collectors and not slow:
+        return
+
+    record = QueryRecord(statement, parameters, elapsed, call_site())
+    for collector in collectors:
+        collector.append(record)
+
+    if slow:
+        plan = explain(conn, statement, parameters) if QUERY_EXPLAIN and not executemany else []
+        logger.warning(
+            "Slow query (%.1f ms) at %s\n%s\nParameters: %r%s",
+            elapsed * 1000, record.call_site, statement.strip(), parameters,
+            "".join(f"\n  {' | '.join(str(value) for value in row)}" for row in plan)
+        )
+
+def instrument_engine(engine):
+    """Capture every statement run on a sync Engine (use .sync_engine for async engines)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def find_n_plus_one(records, threshold: int = N_PLUS_ONE_THRESHOLD) -> list:
+    """
+    Statement shapes that ran at least `threshold` times.
+
+    Returns:
+        List of {"shape", "count", "call_sites"}, most repeated first
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(record.shape, []).append(record)
+    return sorted(
+        (
+            {"shape": shape, "count": len(group), "call_sites": sorted({record.call_site for record in group})}
+            for shape, group in groups.items() if len(group) >= threshold
+        ),
+        key=lambda finding: -finding["count"]
+    )
+
+@contextmanager
+def capture_queries():
+    """Collect the QueryRecords of every statement run inside the block (same task / context)"""
+    records = []
+    token = _collectors.set(_collectors.get() + (records,))
+    try:
+        yield records
+    finally:
+        _collectors.reset(token)
+
+@contextmanager
+def assert_max_queries(budget: int):
+    """Raise QueryBudgetExceeded if the block runs more than `budget` statements"""
+    with capture_queries() as records:
+        yield records
+    if len(records) > budget:
+        raise QueryBudgetExceeded(
+            f"{len(records)} queries, budget is {budget}:\n"
+            + "\n".join(f"  {record.call_site}: {record.shape}" for record in records)
+        )
+
+class QueryLogMiddleware:
+    """ASGI middleware applying the N+1 check and query budget to each request"""
+
+    def __init__(self, app, budget: int = QUERY_BUDGET, strict: bool = QUERY_BUDGET_STRICT):
+        self.app = app
+        self.budget = budget
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_line = f"{scope['method']} {scope['path']}"
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                db_ms = sum(record.seconds for record in records) * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-query-count", str(len(records)).encode()),
+                    (b"server-timing", f'db;dur={db_ms:.2f};desc="{len(records)} queries"'.encode()),
+                ]
+            await send(message)
+
+        with capture_queries() as records:
+            await self.app(scope, receive, send_with_headers)
+
+        for finding in find_n_plus_one(records):
+            logger.warning(
+                "Possible N+1 in %s: %d x %s\n  from %s",
+                request_line, finding["count"], finding["shape"], "\n  from ".join(finding["call_sites"])
+            )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s ran %d queries:\n%s", request_line, len(records), "\n".join(
+                f"  {record.seconds * 1000:7.2f} ms  {record.call_site}: {record.shape}" for record in records
+            ))
+
+        if self.budget and len(records) > self.budget:
+            message = f"{request_line} ran {len(records)} queries, budget is {self.budget}"
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
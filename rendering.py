@@ -0,0 +1,149 @@
+"""
+Template and Static Asset Delivery
+Jinja2 environment setup and precompressed, long-cached static files.
+
+Templates are compiled once and kept in memory. With
+TEMPLATE_BYTECODE_CACHE_DIR set, the compiled code is also written to disk so
+a restarted worker skips the compile step, and TEMPLATE_AUTO_RELOAD=False
+(the default unless DEBUG=True) stops Jinja from checking every template's
+mtime on every render.
+
+Static files can be precompressed with `python manage.py compress-static`,
+which writes .gz (and .br when the brotli package is installed) next to each
+text asset. PrecompressedStaticFiles serves those to clients that accept
+them. Templates link assets through static_url(), which appends a content
+hash, so versioned URLs are cached for a year and a changed file simply gets
+a new URL.
+"""
+
+import gzip
+import hashlib
+import os
+import stat
+import time
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, Template
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+from metrics import METRICS_ENABLED, observe_template
+
+TEMPLATE_DIR = "templates"
+STATIC_DIR = "static"
+
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", os.getenv("DEBUG", "False")).lower() == "true"
+TEMPLATE_BYTECODE_CACHE_DIR = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR", "")
+# Unversioned static URLs (no ?v=) may be cached this long
+STATIC_MAX_AGE_SECONDS = int(os.getenv("STATIC_MAX_AGE_SECONDS", "3600"))
+VERSIONED_STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".html", ".json", ".txt", ".map"}
+# Preferred first
+STATIC_ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+class TimedTemplate(Template):
+    """Template that reports each render's duration to metrics.py"""
+
+    def render(self, *args, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            observe_template(self.name, time.perf_counter() - start)
+
+templates = Jinja2Templates(directory=TEMPLATE_DIR)
+if METRICS_ENABLED:
+    # Must be set before the first template is loaded
+    templates.env.template_class = TimedTemplate
+templates.env.auto_reload = TEMPLATE_AUTO_RELOAD
+if TEMPLATE_BYTECODE_CACHE_DIR:
+    os.makedirs(TEMPLATE_BYTECODE_CACHE_DIR, exist_ok=True)
+    templates.env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_BYTECODE_CACHE_DIR)
+
+_static_versions = {}
+
+def static_url(path: str) -> str:
+    """URL of a file under static/ with a content hash, e.g. /static/css/style.css?v=1a2b3c4d"""
+    version = None if TEMPLATE_AUTO_RELOAD else _static_versions.get(path)
+    if version is None:
+        try:
+            with open(os.path.join(STATIC_DIR, path), "rb") as asset:
+                version = hashlib.blake2b(asset.read(), digest_size=4).hexdigest()
+        except OSError:
+            return f"/static/{path}"
+        _static_versions[path] = version
+    return f"/static/{path}?v={version}"
+
+templates.env.globals["static_url"] = static_url
+
+def warm_templates():
+    """Compile every template now rather than on the first request that uses it"""
+    for name in templates.env.list_templates():
+        templates.env.get_template(name)
+
+def compress_static(directory: str = STATIC_DIR) -> list:
+    """
+    Write .gz (and .br, if brotli is installed) copies of text assets.
+
+    Files whose compressed copy is already newer than the source are skipped.
+
+    Returns:
+        Paths of the files written
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    compressors = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressors.append((".br", lambda data: brotli.compress(data, quality=11)))
+
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            source = os.path.join(root, name)
+            with open(source, "rb") as asset:
+                data = None
+                for suffix, compress in compressors:
+                    target = source + suffix
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                        continue
+                    if data is None:
+                        data = asset.read()
+                    with open(target, "wb") as compressed:
+                        compressed.write(compress(data))
+                    written.append(target)
+    return written
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers a precompressed sibling (.br / .gz) and sets Cache-Control"""
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = None
+        if scope["method"] in ("GET", "HEAD"):
+            accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+            for encoding, suffix in STATIC_ENCODINGS:
+                if encoding not in accept_encoding:
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    # The media type is guessed from the name without the .gz / .br suffix
+                    response = self.file_response(full_path, stat_result, scope)
+                    response.headers["Content-Encoding"] = encoding
+                    break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        response.headers["Vary"] = "Accept-Encoding"
+        if b"v=" in scope.get("query_string", b""):
+            response.headers["Cache-Control"] = VERSIONED_STATIC_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE_SECONDS}"
+        return response
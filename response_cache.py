@@ -0,0 +1,208 @@
+"""
+Response Cache
+Caches rendered student payloads and answers conditional GETs.
+
+Entries are keyed by (kind, reg_no, version). Every write to a student bumps
+that student's version after the commit, so later reads miss the old
+entries instead of having to find and delete them. The version is read
+before the student is loaded, so a render that races a write is stored
+under the old version and never served again.
+
+ETags are a hash of the response body, which keeps them valid across
+restarts and between processes. Clients that send a matching If-None-Match
+get a 304 without the body being rendered or sent.
+
+Backends:
+    memory - in-process LRU (default); versions are per process, so with
+             several workers another worker's writes show up after
+             RESPONSE_CACHE_TTL_SECONDS at the latest
+    redis  - any Redis-compatible server at REDIS_URL, shared by all
+             workers (requires the redis package)
+    none   - no caching, ETags are still sent
+"""
+
+import hashlib
+import os
+
+from fastapi import Response
+
+from cache import TTLCache
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_KEY_PREFIX = os.getenv("RESPONSE_CACHE_REDIS_PREFIX", "student_portal:")
+
+# Authenticated and changeable: clients may keep a copy but must revalidate
+CACHE_CONTROL = "private, no-cache"
+
+class MemoryBackend:
+    """In-process LRU of rendered responses plus a per-process version table"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.versions = {}
+
+    async def version(self, reg_no: str) -> int:
+        return self.versions.get(reg_no, 0)
+
+    async def bump(self, reg_nos):
+        for reg_no in reg_nos:
+            self.versions[reg_no] = self.versions.get(reg_no, 0) + 1
+
+    async def get(self, key: str):
+        return self.entries.get(key)
+
+    async def set(self, key: str, etag: str, body: bytes):
+        self.entries.set(key, (etag, body))
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self.entries.stats()}
+
+class RedisBackend:
+    """Responses and versions in a Redis-compatible server, shared by every worker"""
+
+    def __init__(self, url: str, ttl: float, prefix: str = REDIS_KEY_PREFIX):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise ImportError("RESPONSE_CACHE_BACKEND=redis requires redis (pip install redis)")
+
+        self.client = redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def _version_key(self, reg_no: str) -> str:
+        return f"{self.prefix}version:{reg_no}"
+
+    async def version(self, reg_no: str) -> int:
+        return int(await self.client.get(self._version_key(reg_no)) or 0)
+
+    async def bump(self, reg_nos):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for reg_no in reg_nos:
+                pipe.incr(self._version_key(reg_no))
+            await pipe.execute()
+
+    async def get(self, key: str):
+        value = await self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        etag, body = value.split(b"\n", 1)
+        return etag.decode(), body
+
+    async def set(self, key: str, etag: str, body: bytes):
+        await self.client.set(self.prefix + key, etag.encode() + b"\n" + body, ex=self.ttl)
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+class NullBackend:
+    async def version(self, reg_no: str) -> int:
+        return 0
+
+    async def bump(self, reg_nos):
+        pass
+
+    async def get(self, key: str):
+        return None
+
+    async def set(self, key: str, etag: str, body: bytes):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+def create_backend(name: str = RESPONSE_CACHE_BACKEND):
+    if name == "redis":
+        return RedisBackend(REDIS_URL, RESPONSE_CACHE_TTL_SECONDS)
+    if name == "none":
+        return NullBackend()
+    return MemoryBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats_counters = {"hits": 0, "misses": 0, "not_modified": 0, "fragment_hits": 0, "fragment_misses": 0}
+
+    async def respond(self, request, kind: str, reg_no: str, render, media_type: str = "application/json") -> Response:
+        """
+        Serve a student's `kind` payload from the cache, rendering it on a miss.
+
+        Args:
+            request: The incoming request (for If-None-Match)
+            kind: What is being cached, e.g. "student" or "marks"
+            reg_no: The student the payload belongs to
+            render: Async callable returning the body as bytes; exceptions
+                (e.g. HTTPException for a missing student) propagate uncached
+            media_type: Content type of the body
+        """
+        etag, body, hit = await self._load(kind, reg_no, render)
+        self.stats_counters["hits" if hit else "misses"] += 1
+
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.stats_counters["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    async def warm(self, kind: str, reg_no: str, render) -> bool:
+        """Fill a student's `kind` entry ahead of the first request; True if it was rendered"""
+        _, _, hit = await self._load(kind, reg_no, render)
+        return not hit
+
+    async def _load(self, kind: str, reg_no: str, render):
+        """(etag, body, whether it was cached) of the current entry, rendering and storing it if missing"""
+        version = await self.backend.version(reg_no)
+        key = f"{kind}:{reg_no}:{version}"
+
+        entry = await self.backend.get(key)
+        if entry is not None:
+            etag, body = entry
+            return etag, body, True
+        body = await render()
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        await self.backend.set(key, etag, body)
+        return etag, body, False
+
+    async def fragment(self, kind: str, reg_no: str, render) -> str:
+        """
+        Cache a piece of a student's page (e.g. the semester tables) under the
+        student's data version, so it outlives page entries keyed on other inputs.
+
+        Args:
+            render: Async callable returning the fragment's HTML
+        """
+        version = await self.backend.version(reg_no)
+        key = f"fragment:{kind}:{reg_no}:{version}"
+
+        entry = await self.backend.get(key)
+        if entry is not None:
+            self.stats_counters["fragment_hits"] += 1
+            return entry[1].decode()
+
+        self.stats_counters["fragment_misses"] += 1
+        html = await render()
+        await self.backend.set(key, "", html.encode())  # Fragments have no ETag
+        return html
+
+    async def invalidate_students(self, reg_nos):
+        """Bump the version of each student; call after the write is committed"""
+        reg_nos = set(reg_nos)
+        if reg_nos:
+            await self.backend.bump(reg_nos)
+
+    def stats(self) -> dict:
+        return {**self.backend.stats(), **self.stats_counters}
+
+response_cache = ResponseCache(create_backend())
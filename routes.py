@@ -1,22 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from datetime import timedelta
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, File, UploadFile, Query, Path
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_, or_
+from sqlalchemy.orm import joinedload
+from markupsafe import Markup
+from sqlalchemy.exc import IntegrityError
+from datetime import timedelta, datetime
 from typing import Optional, List
+import base64
+import csv
+import json
+import secrets
 
-from models import get_db, Student, Mark, Teacher
-from schemas import TeacherLogin, TeacherCreate, TokenResponse, SemesterMarks, Mark as MarkSchema, StudentCreateWithMarks, Student as StudentSchema, MarkCreate
-from auth import authenticate_teacher, create_teacher, create_access_token, get_current_teacher, ACCESS_TOKEN_EXPIRE_MINUTES
+from models import student_identifier_cache, get_db, get_read_db, use_primary_for, pin_to_primary, resolve_student, resolve_reg_no, resolve_students, find_taken_identifiers, refresh_semester_summaries, save_marks, admission_years_for_semester, get_academic_year_info, duplicate_subject_error, Student, Mark, Teacher
+from schemas import TeacherLogin, TeacherCreate, TokenResponse, SemesterMarks, StudentCreateWithMarks, Student as StudentSchema, MarkCreate, StudentBatchRequest, StudentBatchResponse, StudentListResponse, StudentSearchResult, MarkPatch, MarkWriteResult, SubjectMarksRequest, SubjectStats, CohortStats, Topper, StudentPercentiles
+from importer import import_students, iter_import_rows, DEFAULT_CHUNK_SIZE
+from exporter import export_response, students_query, marks_query
+from search import search_students, DEFAULT_SEARCH_LIMIT
+from response_cache import response_cache
+from rendering import templates
+from metrics import render_prometheus, METRICS_ENABLED, METRICS_TOKEN
+from profiling import require_profile_admin, list_profiles, profile_path
+from serialization import dumps, semester_marks_query, semester_marks_payload
+from analytics import subject_stats, cohort_stats, toppers, student_percentiles, DEFAULT_TOPPERS_LIMIT
+from auth import authenticate_teacher, create_teacher, create_access_token, get_current_teacher, get_password_hash_stats, get_teacher_cache_stats, ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 # Authentication Routes
 @router.post("/api/login", response_model=TokenResponse)
-async def login(login_data: TeacherLogin, db: Session = Depends(get_db)):
-    teacher = authenticate_teacher(db, login_data.username, login_data.password)
+async def login(login_data: TeacherLogin, db: AsyncSession = Depends(get_db)):
+    teacher = await authenticate_teacher(db, login_data.username, login_data.password)
     if not teacher:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -30,8 +44,8 @@ async def login(login_data: TeacherLogin, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/api/signup", response_model=TokenResponse)
-async def signup(signup_data: TeacherCreate, db: Session = Depends(get_db)):
-    teacher = create_teacher(db, signup_data.username, signup_data.password, signup_data.name)
+async def signup(signup_data: TeacherCreate, db: AsyncSession = Depends(get_db)):
+    teacher = await create_teacher(db, signup_data.username, signup_data.password, signup_data.name)
     if not teacher:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -44,6 +58,37 @@ async def signup(signup_data: TeacherCreate, db: Session = Depends(get_db)):
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.get("/api/stats")
+async def get_stats(current_teacher: Teacher = Depends(get_current_teacher)):
+    return {
+        "password_hashing": get_password_hash_stats(),
+        "teacher_cache": get_teacher_cache_stats(),
+        "student_identifier_cache": student_identifier_cache.stats(),
+        "response_cache": response_cache.stats()
+    }
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    if not METRICS_ENABLED or not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(content=render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/admin/profiles", response_class=HTMLResponse, include_in_schema=False)
+async def profiles_page(request: Request):
+    teacher = await require_profile_admin(request)
+    return templates.TemplateResponse(
+        "profiles.html", {"request": request, "teacher": teacher, "profiles": list_profiles()}
+    )
+
+@router.get("/admin/profiles/{filename}", include_in_schema=False)
+async def profile_file(filename: str, request: Request):
+    await require_profile_admin(request)
+    return FileResponse(profile_path(filename))
+
 # Web Routes
 @router.get("/", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -58,9 +103,16 @@ async def web_login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    teacher = authenticate_teacher(db, username, password)
+    try:
+        teacher = await authenticate_teacher(db, username, password)
+    except HTTPException as e:
+        return templates.TemplateResponse(
+            "login.html",
+            {"request": request, "error": e.detail},
+            status_code=e.status_code
+        )
     if not teacher:
         return templates.TemplateResponse(
             "login.html", 
@@ -82,9 +134,16 @@ async def web_signup(
     username: str = Form(...),
     password: str = Form(...),
     name: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    teacher = create_teacher(db, username, password, name)
+    try:
+        teacher = await create_teacher(db, username, password, name)
+    except HTTPException as e:
+        return templates.TemplateResponse(
+            "signup.html",
+            {"request": request, "error": e.detail},
+            status_code=e.status_code
+        )
     if not teacher:
         return templates.TemplateResponse(
             "signup.html", 
@@ -111,6 +170,8 @@ async def logout():
     response.delete_cookie(key="access_token")
     return response
 
+DUPLICATE_STUDENT_ERROR = "Student with this Registration Number, UMIS ID, EMIS ID or Aadhar number already exists"
+
 # New Student Management Routes
 @router.get("/enter-student", response_class=HTMLResponse)
 async def enter_student_page(request: Request):
@@ -121,7 +182,7 @@ async def view_student_page(request: Request):
     return templates.TemplateResponse("view_student.html", {"request": request})
 
 @router.post("/enter-student")
-async def create_student_web(request: Request, db: Session = Depends(get_db)):
+async def create_student_web(request: Request, db: AsyncSession = Depends(get_db)):
     # Get form data
     form = await request.form()
     
@@ -153,33 +214,22 @@ async def create_student_web(request: Request, db: Session = Depends(get_db)):
             )
         
         # Check if student already exists
-        existing_student = db.query(Student).filter(
-            or_(
-                Student.reg_no == student_data['reg_no'],
-                Student.umis_id == student_data['umis_id'],
-                Student.emis_id == student_data['emis_id']
-            )
-        ).first()
+        taken = await find_taken_identifiers(
+            db, [student_data['reg_no'], student_data['umis_id'], student_data['emis_id']]
+        )
         
-        if existing_student:
+        if taken:
             return templates.TemplateResponse(
                 "enter_student.html",
                 {"request": request, "error": "Student with this Registration Number, UMIS ID, or EMIS ID already exists"}
             )
         
-        # Create new student
-        new_student = Student(**student_data)
-        db.add(new_student)
-        db.commit()
-        db.refresh(new_student)
-        
         # Get available semesters for this student
-        from models import get_academic_year_info
         academic_info = get_academic_year_info(admission_year)
         available_semesters = academic_info['available_semesters']
         
-        # Extract and save marks only for available semesters
-        marks_saved = 0
+        # Extract marks only for available semesters
+        marks = []
         for semester in available_semesters:
             for subject in range(1, 8):
                 subject_code = form.get(f'semester_{semester}_subject_{subject}_code')
@@ -191,24 +241,43 @@ async def create_student_web(request: Request, db: Session = Depends(get_db)):
                 if all([subject_code, subject_name, internal1, internal2]) and \
                    all([str(x).strip() for x in [subject_code, subject_name, internal1, internal2]]):
                     try:
-                        mark = Mark(
-                            student_id=new_student.reg_no,
-                            semester=semester,
-                            subject_code=subject_code.strip(),
-                            subject_name=subject_name.strip(),
-                            internal_1=float(internal1),
-                            internal_2=float(internal2)
-                        )
-                        db.add(mark)
-                        marks_saved += 1
+                        marks.append({
+                            "semester": semester,
+                            "subject_code": subject_code.strip(),
+                            "subject_name": subject_name.strip(),
+                            "internal_1": float(internal1),
+                            "internal_2": float(internal2)
+                        })
                     except ValueError:
                         continue  # Skip invalid marks
         
-        db.commit()
+        duplicate_error = duplicate_subject_error(marks)
+        if duplicate_error:
+            return templates.TemplateResponse(
+                "enter_student.html",
+                {"request": request, "error": duplicate_error}
+            )
+        
+        # The student, marks and summaries are committed together
+        new_student = Student(**student_data)
+        db.add(new_student)
+        for mark in marks:
+            db.add(Mark(student_id=new_student.reg_no, **mark))
+        try:
+            await refresh_semester_summaries(db, [new_student.reg_no])
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return templates.TemplateResponse(
+                "enter_student.html",
+                {"request": request, "error": DUPLICATE_STUDENT_ERROR}
+            )
+        await response_cache.invalidate_students([new_student.reg_no])
+        pin_to_primary([new_student])
         
         success_msg = f"Student {new_student.name} created successfully"
-        if marks_saved > 0:
-            success_msg += f" with {marks_saved} subject marks"
+        if marks:
+            success_msg += f" with {len(marks)} subject marks"
         
         return templates.TemplateResponse(
             "enter_student.html",
@@ -216,7 +285,7 @@ async def create_student_web(request: Request, db: Session = Depends(get_db)):
         )
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return templates.TemplateResponse(
             "enter_student.html",
             {"request": request, "error": f"Error creating student: {str(e)}"}
@@ -226,7 +295,7 @@ async def create_student_web(request: Request, db: Session = Depends(get_db)):
 async def search_student_web(
     request: Request,
     student_id: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not student_id.strip():
         return templates.TemplateResponse(
@@ -243,25 +312,26 @@ async def search_student_web(
 @router.post("/api/student", response_model=StudentSchema)
 async def create_student(
     student_data: StudentCreateWithMarks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_teacher: Teacher = Depends(get_current_teacher)
 ):
     # Check if student with any of the IDs already exists
-    existing_student = db.query(Student).filter(
-        or_(
-            Student.reg_no == student_data.reg_no,
-            Student.umis_id == student_data.umis_id,
-            Student.emis_id == student_data.emis_id
-        )
-    ).first()
+    taken = await find_taken_identifiers(
+        db, [student_data.reg_no, student_data.umis_id, student_data.emis_id]
+    )
     
-    if existing_student:
+    if taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Student with this Registration Number, UMIS ID, or EMIS ID already exists"
         )
     
-    # Create new student
+    marks = [mark_data.model_dump(exclude={"student_id"}) for mark_data in student_data.marks]
+    duplicate_error = duplicate_subject_error(marks)
+    if duplicate_error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=duplicate_error)
+    
+    # Create the student with its marks and summaries in one transaction
     new_student = Student(
         reg_no=student_data.reg_no,
         umis_id=student_data.umis_id,
@@ -269,129 +339,218 @@ async def create_student(
         name=student_data.name,
         aadhar_number=student_data.aadhar_number,
         phone_number=student_data.phone_number,
-        address=student_data.address
+        address=student_data.address,
+        admission_year=student_data.admission_year
     )
-    
     db.add(new_student)
-    db.commit()
-    db.refresh(new_student)
-    
-    # Add marks if provided
-    if student_data.marks:
-        for mark_data in student_data.marks:
-            new_mark = Mark(
-                student_id=new_student.reg_no,
-                semester=mark_data.semester,
-                subject_code=mark_data.subject_code,
-                subject_name=mark_data.subject_name,
-                internal_1=mark_data.internal_1,
-                internal_2=mark_data.internal_2
-            )
-            db.add(new_mark)
-        
-        db.commit()
+    for mark in marks:
+        db.add(Mark(student_id=new_student.reg_no, **mark))
+    
+    try:
+        await refresh_semester_summaries(db, [new_student.reg_no])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=DUPLICATE_STUDENT_ERROR)
     
+    await response_cache.invalidate_students([new_student.reg_no])
+    pin_to_primary([new_student])
     return new_student
 
-@router.get("/api/student/{identifier}")
+async def student_body(db, reg_no: str) -> bytes:
+    """Cached body of GET /api/student/{identifier}"""
+    student = await db.get(Student, reg_no)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return StudentSchema.model_validate(student).model_dump_json().encode()
+
+async def student_marks_body(db, reg_no: str) -> bytes:
+    """Cached body of GET /api/student/{identifier}/marks"""
+    # Marks and their semester totals as plain rows in one query, encoded once
+    result = await db.execute(semester_marks_query(reg_no))
+    rows = result.all()
+    if not rows and not await db.get(Student, reg_no):
+        raise HTTPException(status_code=404, detail="Student not found")
+    return dumps(semester_marks_payload(rows))
+
+@router.get("/api/student/{identifier}", response_model=StudentSchema)
 async def get_student(
+    request: Request,
     identifier: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_teacher: Teacher = Depends(get_current_teacher)
 ):
     # Search by reg_no, umis_id, or emis_id
-    student = db.query(Student).filter(
-        or_(
-            Student.reg_no == identifier,
-            Student.umis_id == identifier,
-            Student.emis_id == identifier
-        )
-    ).first()
+    use_primary_for(db, identifier)
+    reg_no = await resolve_reg_no(db, identifier)
     
-    if not student:
+    if not reg_no:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    return student
+    return await response_cache.respond(request, "student", reg_no, lambda: student_body(db, reg_no))
+
+LIST_SORT_COLUMNS = {
+    "reg_no": Student.reg_no,
+    "name": Student.name,
+    "admission_year": Student.admission_year,
+}
+
+def _encode_cursor(sort_value, reg_no: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, reg_no]).encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        sort_value, reg_no = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, reg_no
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def _prefix_upper_bound(prefix: str):
+    """Exclusive upper bound of the strings starting with prefix, or None if there is none"""
+    # U+10FFFF can't be incremented, but every string starting with "ab\U0010ffff"
+    # also sorts below "ac"
+    stripped = prefix.rstrip("\U0010ffff")
+    if not stripped:
+        return None
+    next_code_point = ord(stripped[-1]) + 1
+    if 0xD800 <= next_code_point <= 0xDFFF:
+        next_code_point = 0xE000  # Surrogates can't be encoded
+    return stripped[:-1] + chr(next_code_point)
+
+@router.get("/api/students", response_model=StudentListResponse)
+async def list_students(
+    admission_year: Optional[int] = None,
+    current_semester: Optional[int] = Query(None, ge=1, le=6),
+    name_prefix: Optional[str] = None,
+    graduated: Optional[bool] = None,
+    sort: str = Query("reg_no", pattern="^(reg_no|name|admission_year)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    query = select(Student)
+    
+    # Filters - all expressed as ranges on indexed columns
+    if admission_year is not None:
+        query = query.where(Student.admission_year == admission_year)
+    if current_semester is not None:
+        year_range = admission_years_for_semester(current_semester)
+        if year_range is None:
+            return {"students": [], "next_cursor": None}
+        earliest, latest = year_range
+        if earliest is not None:
+            query = query.where(Student.admission_year >= earliest)
+        query = query.where(Student.admission_year <= latest)
+    if name_prefix:
+        # Case-sensitive prefix match as a range, so the name index is used
+        query = query.where(Student.name >= name_prefix)
+        upper_bound = _prefix_upper_bound(name_prefix)
+        if upper_bound is not None:
+            query = query.where(Student.name < upper_bound)
+    if graduated is not None:
+        # Same rule as models.is_student_graduated: graduated once the current year reaches admission_year + 3
+        last_graduated_batch = datetime.now().year - 3
+        if graduated:
+            query = query.where(Student.admission_year <= last_graduated_batch)
+        else:
+            query = query.where(Student.admission_year > last_graduated_batch)
+    
+    # Keyset pagination on (sort column, reg_no) instead of OFFSET
+    sort_column = LIST_SORT_COLUMNS[sort]
+    descending = order == "desc"
+    if cursor:
+        last_value, last_reg_no = _decode_cursor(cursor)
+        if sort == "reg_no":
+            query = query.where(Student.reg_no < last_reg_no if descending else Student.reg_no > last_reg_no)
+        elif descending:
+            query = query.where(or_(
+                sort_column < last_value,
+                and_(sort_column == last_value, Student.reg_no < last_reg_no)
+            ))
+        else:
+            query = query.where(or_(
+                sort_column > last_value,
+                and_(sort_column == last_value, Student.reg_no > last_reg_no)
+            ))
+    
+    order_columns = [sort_column] if sort == "reg_no" else [sort_column, Student.reg_no]
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in order_columns])
+    
+    result = await db.execute(query.limit(limit + 1))
+    students = result.scalars().all()
+    
+    next_cursor = None
+    if len(students) > limit:
+        students = students[:limit]
+        last = students[-1]
+        next_cursor = _encode_cursor(getattr(last, sort), last.reg_no)
+    
+    return {"students": students, "next_cursor": next_cursor}
+
+@router.get("/api/search/students", response_model=List[StudentSearchResult])
+async def search_students_by_name(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    return await search_students(db, q, limit)
+
+@router.post("/api/students/batch", response_model=StudentBatchResponse)
+async def get_students_batch(
+    batch: StudentBatchRequest,
+    db: AsyncSession = Depends(get_read_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    for identifier in batch.identifiers:
+        use_primary_for(db, identifier)
+    
+    # Two queries in total, whatever the number of identifiers
+    resolved = await resolve_students(db, batch.identifiers, with_summaries=True)
+    
+    # One entry per student, in request order, even if several of their IDs were sent
+    students = {}
+    not_found = []
+    for identifier in dict.fromkeys(batch.identifiers):
+        student = resolved.get(identifier)
+        if student is None:
+            not_found.append(identifier)
+        else:
+            students.setdefault(student.reg_no, student)
+    
+    return {"students": list(students.values()), "not_found": not_found}
 
-@router.get("/api/student/{identifier}/marks")
+@router.get("/api/student/{identifier}/marks", response_model=List[SemesterMarks])
 async def get_student_marks(
+    request: Request,
     identifier: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_teacher: Teacher = Depends(get_current_teacher)
 ):
-    # First find the student
-    student = db.query(Student).filter(
-        or_(
-            Student.reg_no == identifier,
-            Student.umis_id == identifier,
-            Student.emis_id == identifier
-        )
-    ).first()
+    use_primary_for(db, identifier)
+    reg_no = await resolve_reg_no(db, identifier)
     
-    if not student:
+    if not reg_no:
         raise HTTPException(status_code=404, detail="Student not found")
     
-    # Get all marks for the student
-    marks = db.query(Mark).filter(Mark.student_id == student.reg_no).all()
-    
-    # Group marks by semester and calculate totals
-    semester_marks = {}
-    for mark in marks:
-        if mark.semester not in semester_marks:
-            semester_marks[mark.semester] = []
-        
-        mark_data = MarkSchema(
-            id=mark.id,
-            semester=mark.semester,
-            subject_code=mark.subject_code,
-            subject_name=mark.subject_name,
-            internal_1=mark.internal_1,
-            internal_2=mark.internal_2,
-            student_id=mark.student_id,
-            best_of_two=mark.best_of_two
-        )
-        semester_marks[mark.semester].append(mark_data)
-    
-    # Calculate totals for each semester
-    result = []
-    for semester, subjects in semester_marks.items():
-        total_marks = sum(subject.best_of_two for subject in subjects)
-        max_marks = len(subjects) * 50  # Assuming max 50 marks per subject
-        percentage = (total_marks / max_marks * 100) if max_marks > 0 else 0
-        cgpa_cutoff = percentage / 9.5  # Simple CGPA calculation
-        
-        semester_data = SemesterMarks(
-            semester=semester,
-            subjects=subjects,
-            total_marks=total_marks,
-            percentage=percentage,
-            cgpa_cutoff=cgpa_cutoff
-        )
-        result.append(semester_data)
-    
-    return sorted(result, key=lambda x: x.semester)
+    return await response_cache.respond(request, "marks", reg_no, lambda: student_marks_body(db, reg_no))
 
-@router.put("/api/student/{identifier}/marks")
+@router.put("/api/student/{identifier}/marks", response_model=MarkWriteResult)
 async def update_student_marks(
     identifier: str,
     marks_data: List[MarkCreate],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_teacher: Teacher = Depends(get_current_teacher)
 ):
     # First find the student
-    student = db.query(Student).filter(
-        or_(
-            Student.reg_no == identifier,
-            Student.umis_id == identifier,
-            Student.emis_id == identifier
-        )
-    ).first()
+    student = await resolve_student(db, identifier)
     
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Check if student can have marks for the requested semesters
-    from models import get_academic_year_info
     academic_info = get_academic_year_info(student.admission_year)
     
     # Validate that marks are only being added for available semesters
@@ -402,93 +561,294 @@ async def update_student_marks(
                 detail=f"Cannot add marks for semester {mark_data.semester}. Student is currently in semester {academic_info['current_semester']}"
             )
     
-    # Delete existing marks for the semesters being updated
+    # Each subject may appear only once per semester
+    rows = [{**mark_data.model_dump(), "student_id": student.reg_no} for mark_data in marks_data]
+    duplicate_error = duplicate_subject_error(rows)
+    if duplicate_error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=duplicate_error)
+    
+    # The sent subjects replace each touched semester; only the differences are written
     semesters_to_update = list(set([mark.semester for mark in marks_data]))
-    db.query(Mark).filter(
+    counts = await save_marks(db, rows, replace_semesters=True)
+    await db.commit()
+    await response_cache.invalidate_students([student.reg_no])
+    pin_to_primary([student])
+    
+    return {
+        "message": f"Updated marks for {len(marks_data)} subjects across {len(semesters_to_update)} semesters",
+        **counts
+    }
+
+@router.patch("/api/student/{identifier}/marks/{semester}/{subject_code}", response_model=MarkWriteResult)
+async def patch_student_mark(
+    identifier: str,
+    semester: int,
+    subject_code: str,
+    mark_patch: MarkPatch,
+    db: AsyncSession = Depends(get_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    student = await resolve_student(db, identifier)
+    
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    academic_info = get_academic_year_info(student.admission_year)
+    if semester not in academic_info['available_semesters']:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot add marks for semester {semester}. Student is currently in semester {academic_info['current_semester']}"
+        )
+    
+    result = await db.execute(select(Mark).where(
         Mark.student_id == student.reg_no,
-        Mark.semester.in_(semesters_to_update)
-    ).delete(synchronize_session=False)
+        Mark.semester == semester,
+        Mark.subject_code == subject_code
+    ))
+    mark = result.scalars().first()
     
-    # Add new marks
-    for mark_data in marks_data:
-        new_mark = Mark(
-            student_id=student.reg_no,
-            semester=mark_data.semester,
-            subject_code=mark_data.subject_code,
-            subject_name=mark_data.subject_name,
-            internal_1=mark_data.internal_1,
-            internal_2=mark_data.internal_2
+    # Start from the stored values so only the sent fields change
+    row = {"student_id": student.reg_no, "semester": semester, "subject_code": subject_code}
+    if mark is not None:
+        row.update(subject_name=mark.subject_name, internal_1=mark.internal_1, internal_2=mark.internal_2)
+    row.update(mark_patch.model_dump(exclude_unset=True, exclude_none=True))
+    
+    missing = [field for field in ("subject_name", "internal_1", "internal_2") if field not in row]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"New subject {subject_code} needs: {', '.join(missing)}"
+        )
+    
+    counts = await save_marks(db, [row])
+    await db.commit()
+    await response_cache.invalidate_students([student.reg_no])
+    pin_to_primary([student])
+    
+    return {"message": f"Saved marks for {subject_code} in semester {semester}", **counts}
+
+@router.put("/api/subjects/{subject_code}/semester/{semester}/marks", response_model=MarkWriteResult)
+async def update_subject_marks(
+    subject_code: str,
+    marks_data: SubjectMarksRequest,
+    semester: int = Path(..., ge=1, le=6),
+    db: AsyncSession = Depends(get_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    # One query resolves every student in the class
+    students = await resolve_students(db, [entry.identifier for entry in marks_data.marks])
+    
+    not_found = sorted({entry.identifier for entry in marks_data.marks if entry.identifier not in students})
+    if not_found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Students not found: {', '.join(not_found)}"
         )
-        db.add(new_mark)
     
-    db.commit()
+    # Semester availability only depends on the admission year, so check each year once
+    available = {
+        year: semester in get_academic_year_info(year)['available_semesters']
+        for year in {student.admission_year for student in students.values()}
+    }
     
-    return {"message": f"Updated marks for {len(marks_data)} subjects across {len(semesters_to_update)} semesters"}
+    rows = {}
+    not_in_semester = []
+    for entry in marks_data.marks:
+        student = students[entry.identifier]
+        if not available[student.admission_year]:
+            not_in_semester.append(entry.identifier)
+            continue
+        if student.reg_no in rows:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Student {student.reg_no} appears more than once"
+            )
+        rows[student.reg_no] = {
+            "student_id": student.reg_no,
+            "semester": semester,
+            "subject_code": subject_code,
+            "subject_name": marks_data.subject_name,
+            "internal_1": entry.internal_1,
+            "internal_2": entry.internal_2
+        }
+    
+    if not_in_semester:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot add marks for semester {semester} for students not yet in it: {', '.join(not_in_semester)}"
+        )
+    
+    # The whole class is written as one upsert batch in a single transaction
+    counts = await save_marks(db, list(rows.values()))
+    await db.commit()
+    await response_cache.invalidate_students(rows.keys())
+    pin_to_primary(students.values())
+    
+    return {
+        "message": f"Saved {subject_code} marks for {len(rows)} students in semester {semester}",
+        **counts
+    }
+
+# Analytics Routes
+@router.get("/api/analytics/subjects", response_model=List[SubjectStats])
+async def get_subject_stats(
+    semester: Optional[int] = Query(None, ge=1, le=6),
+    admission_year: Optional[int] = None,
+    subject_code: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    return await subject_stats(db, semester, admission_year, subject_code)
+
+@router.get("/api/analytics/cohorts", response_model=List[CohortStats])
+async def get_cohort_stats(
+    semester: Optional[int] = Query(None, ge=1, le=6),
+    db: AsyncSession = Depends(get_read_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    return await cohort_stats(db, semester)
+
+@router.get("/api/analytics/toppers", response_model=List[Topper])
+async def get_toppers(
+    semester: int = Query(..., ge=1, le=6),
+    admission_year: Optional[int] = None,
+    limit: int = Query(DEFAULT_TOPPERS_LIMIT, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    return await toppers(db, semester, admission_year, limit)
+
+@router.get("/api/analytics/student/{identifier}/percentile", response_model=StudentPercentiles)
+async def get_student_percentiles(
+    identifier: str,
+    db: AsyncSession = Depends(get_read_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    use_primary_for(db, identifier)
+    student = await resolve_student(db, identifier)
+    
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    return {
+        "reg_no": student.reg_no,
+        "admission_year": student.admission_year,
+        "semesters": await student_percentiles(db, student)
+    }
+
+@router.post("/api/import/students")
+async def import_students_upload(
+    file: UploadFile = File(...),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    # The upload is read and committed chunk by chunk, never loaded whole; each
+    # chunk is parsed in a worker thread (see importer.import_students)
+    try:
+        return await import_students(db, iter_import_rows(file.file, file.filename), chunk_size)
+    except (ImportError, csv.Error, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not read import file: {e}"
+        )
+
+@router.get("/api/export/students")
+async def export_students(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    admission_year: Optional[int] = None,
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    return export_response(students_query(admission_year), format, "students")
+
+@router.get("/api/export/marks")
+async def export_marks(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    admission_year: Optional[int] = None,
+    semester: Optional[int] = Query(None, ge=1, le=6),
+    current_teacher: Teacher = Depends(get_current_teacher)
+):
+    return export_response(marks_query(admission_year, semester), format, "marks")
 
 # Web Routes for Student Search
+async def _render_semester_tables(db: AsyncSession, reg_no: str) -> str:
+    result = await db.execute(
+        select(Mark)
+        .where(Mark.student_id == reg_no)
+        .options(joinedload(Mark.semester_summary))
+        .order_by(Mark.semester, Mark.id)
+    )
+    marks = result.scalars().all()
+    
+    # Group by semester
+    semester_marks = {}
+    for mark in marks:
+        if mark.semester not in semester_marks:
+            semester_marks[mark.semester] = []
+        semester_marks[mark.semester].append(mark)
+    
+    # Attach the precomputed semester totals
+    semester_data = []
+    for semester in sorted(semester_marks.keys()):
+        subjects = semester_marks[semester]
+        summary = subjects[0].semester_summary
+        
+        semester_data.append({
+            'semester': semester,
+            'subjects': subjects,
+            'total_marks': summary.total_marks,
+            'max_marks': summary.max_marks,
+            'percentage': round(summary.percentage, 2),
+            'cgpa_cutoff': round(summary.cgpa_cutoff, 2)
+        })
+    
+    return templates.get_template("_semester_tables.html").render(semester_data=semester_data)
+
 @router.get("/student/{identifier}", response_class=HTMLResponse)
 async def student_details_page(
     request: Request,
     identifier: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     try:
-        # Find student
-        student = db.query(Student).filter(
-            or_(
-                Student.reg_no == identifier,
-                Student.umis_id == identifier,
-                Student.emis_id == identifier
-            )
-        ).first()
+        use_primary_for(db, identifier)
+        reg_no = await resolve_reg_no(db, identifier)
         
-        if not student:
+        if not reg_no:
             return templates.TemplateResponse(
                 "dashboard.html",
                 {"request": request, "error": "Student not found"}
             )
         
-        # Get academic information
-        from models import get_academic_year_info
-        academic_info = get_academic_year_info(student.admission_year)
-        
-        # Get marks
-        marks = db.query(Mark).filter(Mark.student_id == student.reg_no).all()
-        
-        # Group by semester
-        semester_marks = {}
-        for mark in marks:
-            if mark.semester not in semester_marks:
-                semester_marks[mark.semester] = []
-            semester_marks[mark.semester].append(mark)
-        
-        # Calculate semester totals
-        semester_data = []
-        for semester in sorted(semester_marks.keys()):
-            subjects = semester_marks[semester]
-            total_marks = sum(subject.best_of_two for subject in subjects)
-            max_marks = len(subjects) * 50
-            percentage = (total_marks / max_marks * 100) if max_marks > 0 else 0
-            cgpa_cutoff = percentage / 9.5
+        async def render():
+            student = await resolve_student(db, reg_no)
+            if not student:
+                raise HTTPException(status_code=404, detail="Student not found")
             
-            semester_data.append({
-                'semester': semester,
-                'subjects': subjects,
-                'total_marks': total_marks,
-                'percentage': round(percentage, 2),
-                'cgpa_cutoff': round(cgpa_cutoff, 2)
-            })
-        
-        return templates.TemplateResponse(
-            "student_details.html",
-            {
+            # Get academic information
+            academic_info = get_academic_year_info(student.admission_year)
+            
+            # The marks tables only change when the student's data does
+            semester_tables = await response_cache.fragment(
+                "semester_tables", reg_no, lambda: _render_semester_tables(db, reg_no)
+            )
+            
+            return templates.get_template("student_details.html").render({
                 "request": request,
                 "student": student,
-                "semester_data": semester_data,
+                "semester_tables": Markup(semester_tables),
                 "academic_info": academic_info
-            }
-        )
+            }).encode()
+        
+        # The current semester shown on the page moves with the date
+        page_kind = f"page:{datetime.now().date().isoformat()}"
+        return await response_cache.respond(request, page_kind, reg_no, render, media_type="text/html")
         
+    except HTTPException as e:
+        return templates.TemplateResponse(
+            "dashboard.html",
+            {"request": request, "error": e.detail}
+        )
     except Exception as e:
         return templates.TemplateResponse(
             "dashboard.html",
@@ -499,7 +859,7 @@ async def student_details_page(
 async def search_student(
     request: Request,
     student_id: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not student_id.strip():
         return templates.TemplateResponse(
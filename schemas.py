@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class TeacherLogin(BaseModel):
@@ -20,6 +20,27 @@ class MarkBase(BaseModel):
 class MarkCreate(MarkBase):
     student_id: str
 
+class MarkPatch(BaseModel):
+    subject_name: Optional[str] = None
+    internal_1: Optional[float] = None
+    internal_2: Optional[float] = None
+
+class SubjectMarkEntry(BaseModel):
+    identifier: str  # reg_no, UMIS ID or EMIS ID
+    internal_1: float
+    internal_2: float
+
+class SubjectMarksRequest(BaseModel):
+    subject_name: str
+    marks: List[SubjectMarkEntry] = Field(..., min_length=1, max_length=1000)
+
+class MarkWriteResult(BaseModel):
+    message: str
+    inserted: int
+    updated: int
+    unchanged: int
+    deleted: int
+
 class StudentBase(BaseModel):
     reg_no: str
     umis_id: str
@@ -58,6 +79,38 @@ class SemesterMarks(BaseModel):
     percentage: float
     cgpa_cutoff: float
 
+class SemesterSummary(BaseModel):
+    semester: int
+    subject_count: int
+    total_marks: float
+    max_marks: int
+    percentage: float
+    cgpa_cutoff: float
+    
+    class Config:
+        from_attributes = True
+
+class StudentWithSummaries(Student):
+    semester_summaries: List[SemesterSummary] = []
+
+class StudentBatchRequest(BaseModel):
+    identifiers: List[str] = Field(..., min_length=1, max_length=500)
+
+class StudentBatchResponse(BaseModel):
+    students: List[StudentWithSummaries]
+    not_found: List[str]
+
+class StudentListResponse(BaseModel):
+    students: List[Student]
+    next_cursor: Optional[str] = None
+
+class StudentSearchResult(BaseModel):
+    reg_no: str
+    umis_id: str
+    emis_id: str
+    name: str
+    admission_year: int
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str
@@ -77,3 +130,41 @@ class AcademicInfo(BaseModel):
 
 class StudentWithAcademicInfo(Student):
     academic_info: AcademicInfo
+
+class DistributionStats(BaseModel):
+    count: int
+    mean: float
+    median: float
+    stddev: float
+    min: float
+    max: float
+    pass_rate: float
+
+class SubjectStats(DistributionStats):
+    semester: int
+    subject_code: str
+
+class CohortStats(DistributionStats):
+    admission_year: int
+    semester: int
+
+class Topper(BaseModel):
+    reg_no: str
+    name: str
+    admission_year: int
+    semester: int
+    total_marks: float
+    percentage: float
+    cgpa_cutoff: float
+
+class SemesterPercentile(BaseModel):
+    semester: int
+    percentage: float
+    rank: int
+    cohort_size: int
+    percentile: float
+
+class StudentPercentiles(BaseModel):
+    reg_no: str
+    admission_year: int
+    semesters: List[SemesterPercentile]
@@ -0,0 +1,184 @@
+"""
+Student Search
+Ranked name / partial-ID search for typeahead.
+
+SQLite uses an external-content FTS5 table (students_fts) over students,
+kept in sync by triggers keyed on the students rowid, so every write path -
+ORM, bulk import or raw SQL - updates it with an index lookup. The index stores
+only the tokens; column values are read back from students. VACUUM can
+renumber the rowids of students (it has no INTEGER PRIMARY KEY), so run
+`python manage.py rebuild-search-index` after one.
+MySQL uses a FULLTEXT index on the students table itself. Any other setup
+falls back to a plain name prefix match.
+"""
+
+import logging
+import re
+
+from sqlalchemy import text, select
+from sqlalchemy.exc import OperationalError
+
+from models import engine, Student
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_LIMIT = 10
+# Very short prefixes can match most of the table; only the best this many
+# index hits are joined to students and ranked by the outer query
+SEARCH_CANDIDATE_LIMIT = 500
+
+SQLITE_FTS_TABLE = """
+CREATE VIRTUAL TABLE students_fts USING fts5(
+    reg_no, umis_id, emis_id, name,
+    content = 'students',
+    content_rowid = 'rowid',
+    tokenize = 'unicode61',
+    prefix = '2 3 4'
+)
+"""
+
+# An external-content table can't look up rows by column value, so deletes
+# use the FTS5 'delete' command with the old row's rowid and values
+SQLITE_FTS_TRIGGERS = {
+    "students_fts_insert": """
+    CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts (rowid, reg_no, umis_id, emis_id, name)
+        VALUES (new.rowid, new.reg_no, new.umis_id, new.emis_id, new.name);
+    END
+    """,
+    "students_fts_delete": """
+    CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, reg_no, umis_id, emis_id, name)
+        VALUES ('delete', old.rowid, old.reg_no, old.umis_id, old.emis_id, old.name);
+    END
+    """,
+    "students_fts_update": """
+    CREATE TRIGGER IF NOT EXISTS students_fts_update
+    AFTER UPDATE OF reg_no, umis_id, emis_id, name ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, reg_no, umis_id, emis_id, name)
+        VALUES ('delete', old.rowid, old.reg_no, old.umis_id, old.emis_id, old.name);
+        INSERT INTO students_fts (rowid, reg_no, umis_id, emis_id, name)
+        VALUES (new.rowid, new.reg_no, new.umis_id, new.emis_id, new.name);
+    END
+    """,
+}
+
+# Re-tokenizes every row of the content table (students)
+SQLITE_FTS_FILL = "INSERT INTO students_fts (students_fts) VALUES ('rebuild')"
+
+# Matches on an ID column rank above matches on the name. The candidates are
+# the best-scoring hits, not the first ones found, or broad terms would rank
+# an arbitrary subset and could miss the best match.
+SQLITE_SEARCH = """
+SELECT s.reg_no, s.umis_id, s.emis_id, s.name, s.admission_year
+FROM (
+    SELECT rowid, bm25(students_fts, 10.0, 10.0, 10.0, 1.0) AS score
+    FROM students_fts
+    WHERE students_fts MATCH :match
+    ORDER BY score
+    LIMIT :candidates
+) AS hits
+JOIN students s ON s.rowid = hits.rowid
+ORDER BY hits.score
+LIMIT :limit
+"""
+
+MYSQL_FULLTEXT_INDEX = "ft_students_search"
+
+MYSQL_SEARCH = """
+SELECT reg_no, umis_id, emis_id, name, admission_year,
+       MATCH (name, reg_no, umis_id, emis_id) AGAINST (:match IN BOOLEAN MODE) AS score
+FROM students
+WHERE MATCH (name, reg_no, umis_id, emis_id) AGAINST (:match IN BOOLEAN MODE)
+ORDER BY score DESC
+LIMIT :limit
+"""
+
+def _search_terms(query: str) -> list:
+    return re.findall(r"\w+", query)
+
+def _sqlite_fts_sql(connection):
+    """CREATE statement of students_fts, or None if it doesn't exist"""
+    return connection.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'"
+    )).scalar()
+
+def sqlite_fts_is_external_content(connection) -> bool:
+    """False for a students_fts created by an older release, which kept its own copy of the columns"""
+    sql = _sqlite_fts_sql(connection)
+    return sql is not None and "content" in sql
+
+def create_search_index(rebuild: bool = False):
+    """
+    Create the full-text index (and its sync triggers) if it doesn't exist yet.
+
+    Args:
+        rebuild: Drop and refill the index from the students table
+    """
+    try:
+        with engine.begin() as connection:
+            if connection.dialect.name == "sqlite":
+                if rebuild:
+                    for trigger in SQLITE_FTS_TRIGGERS:
+                        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+                    connection.execute(text("DROP TABLE IF EXISTS students_fts"))
+                if _sqlite_fts_sql(connection) is None:
+                    connection.execute(text(SQLITE_FTS_TABLE))
+                    connection.execute(text(SQLITE_FTS_FILL))
+                for trigger in SQLITE_FTS_TRIGGERS.values():
+                    connection.execute(text(trigger))
+
+            elif connection.dialect.name == "mysql":
+                index_exists = connection.execute(text(
+                    "SELECT COUNT(*) FROM information_schema.statistics "
+                    "WHERE table_schema = DATABASE() AND table_name = 'students' "
+                    "AND index_name = :index"
+                ), {"index": MYSQL_FULLTEXT_INDEX}).scalar()
+                if index_exists and rebuild:
+                    connection.execute(text(f"ALTER TABLE students DROP INDEX {MYSQL_FULLTEXT_INDEX}"))
+                    index_exists = False
+                if not index_exists:
+                    connection.execute(text(
+                        f"ALTER TABLE students ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} "
+                        "(name, reg_no, umis_id, emis_id)"
+                    ))
+    except OperationalError as e:
+        # e.g. SQLite built without FTS5 - search falls back to a name prefix match
+        logger.warning(f"Full-text search index unavailable: {e}")
+
+async def search_students(db, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list:
+    """
+    Find students whose name or IDs start with every word of the query.
+
+    "jo sm" matches "John Smith"; "REG00" matches REG001, REG002, ...
+
+    Returns:
+        Up to `limit` rows (reg_no, umis_id, emis_id, name, admission_year), best match first
+    """
+    terms = _search_terms(query)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    try:
+        if dialect == "sqlite":
+            match = " ".join(f'"{term}"*' for term in terms)
+            result = await db.execute(
+                text(SQLITE_SEARCH),
+                {"match": match, "candidates": SEARCH_CANDIDATE_LIMIT, "limit": limit}
+            )
+            return result.mappings().all()
+        if dialect == "mysql":
+            match = " ".join(f"+{term}*" for term in terms)
+            result = await db.execute(text(MYSQL_SEARCH), {"match": match, "limit": limit})
+            return result.mappings().all()
+    except OperationalError:
+        logger.warning("Full-text search failed, falling back to name prefix match", exc_info=True)
+
+    result = await db.execute(
+        select(Student.reg_no, Student.umis_id, Student.emis_id, Student.name, Student.admission_year)
+        .where(Student.name.startswith(query.strip(), autoescape=True))
+        .order_by(Student.name)
+        .limit(limit)
+    )
+    return result.mappings().all()
@@ -0,0 +1,74 @@
+"""
+Fast Serialization
+Encode read-only payloads straight from column tuples.
+
+Read routes that only pass data through select plain columns and encode
+them once, instead of loading ORM objects, copying them field by field into
+Pydantic models and validating the result again on the way out. orjson is
+used when installed; the standard json module is the fallback.
+"""
+
+import json
+
+from sqlalchemy import select, and_
+
+from models import Mark, SemesterSummary
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj) -> bytes:
+    """Compact JSON encoding of plain dicts / lists / scalars"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+def semester_marks_query(reg_no: str):
+    """One row per mark with its semester totals, in semester order"""
+    return (
+        select(
+            Mark.semester, Mark.subject_code, Mark.subject_name, Mark.internal_1, Mark.internal_2,
+            Mark.id, Mark.student_id, Mark.best_of_two.label("best_of_two"),
+            SemesterSummary.total_marks, SemesterSummary.percentage, SemesterSummary.cgpa_cutoff
+        )
+        .join(SemesterSummary, and_(
+            SemesterSummary.student_id == Mark.student_id,
+            SemesterSummary.semester == Mark.semester
+        ))
+        .where(Mark.student_id == reg_no)
+        .order_by(Mark.semester, Mark.id)
+    )
+
+def semester_marks_payload(rows) -> list:
+    """
+    Group semester_marks_query rows into the schemas.SemesterMarks shape.
+
+    Returns:
+        List of {semester, subjects, total_marks, percentage, cgpa_cutoff}
+    """
+    semesters = []
+    current = None
+    for (semester, subject_code, subject_name, internal_1, internal_2,
+         mark_id, student_id, best_of_two, total_marks, percentage, cgpa_cutoff) in rows:
+        if current is None or current["semester"] != semester:
+            current = {
+                "semester": semester,
+                "subjects": [],
+                "total_marks": total_marks,
+                "percentage": percentage,
+                "cgpa_cutoff": cgpa_cutoff
+            }
+            semesters.append(current)
+        current["subjects"].append({
+            "semester": semester,
+            "subject_code": subject_code,
+            "subject_name": subject_name,
+            "internal_1": internal_1,
+            "internal_2": internal_2,
+            "id": mark_id,
+            "student_id": student_id,
+            "best_of_two": best_of_two
+        })
+    return semesters
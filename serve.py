@@ -0,0 +1,158 @@
+"""
+Production Server
+Run the portal with several worker processes and production settings.
+
+Usage:
+    python serve.py
+
+`python main.py` is for development: one worker with the file watcher on.
+This launcher starts WORKERS processes without the reloader. Its settings
+come from .env, like the rest of the app.
+
+With gunicorn installed (Linux / macOS), the app is imported once in the
+master process and forked into uvicorn workers (preload). The workers share
+the imported code copy-on-write, and an import error stops the launch before
+any worker starts. Without gunicorn, uvicorn's own process manager starts
+the workers and each one imports the app.
+
+uvloop and httptools are used when installed (SERVER_LOOP / SERVER_HTTP =
+auto). On SIGTERM or Ctrl+C, workers stop accepting connections, finish
+in-flight requests for up to GRACEFUL_TIMEOUT_SECONDS, then run the app's
+shutdown (closing database pools and the password hashing pool).
+
+Metrics and in-memory caches are per worker. The memory response cache would
+keep serving (and 304-confirming) a student's old data from the workers that
+didn't handle the write, so WORKERS defaults to one per CPU only with
+RESPONSE_CACHE_BACKEND=redis and to 1 otherwise. Asking for more workers with
+the memory backend switches the response cache off, with a warning.
+
+Replica read-your-writes pins (REPLICA_STICKY_SECONDS) are per worker too: a
+read that lands on another worker than the write may be served by a replica
+that hasn't caught up yet.
+"""
+
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+# Several workers only share the response cache through redis
+DEFAULT_WORKERS = (os.cpu_count() or 1) if RESPONSE_CACHE_BACKEND == "redis" else 1
+WORKERS = int(os.getenv("WORKERS", str(DEFAULT_WORKERS)))
+KEEPALIVE_SECONDS = int(os.getenv("KEEPALIVE_SECONDS", "5"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))  # Pending connections the kernel queues per listening socket
+GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+WORKER_TIMEOUT_SECONDS = int(os.getenv("WORKER_TIMEOUT_SECONDS", "60"))  # Restart a worker that stops responding
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))  # Recycle workers after this many requests (0 = never)
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")  # auto (uvloop if installed), asyncio or uvloop
+SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")  # auto (httptools if installed), h11 or httptools
+SERVER_ACCESS_LOG = os.getenv("SERVER_ACCESS_LOG", "False").lower() == "true"
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")  # Proxies trusted for X-Forwarded-*
+
+logger = logging.getLogger("serve")
+
+try:
+    from uvicorn.workers import UvicornWorker
+except ImportError:  # gunicorn is not installed
+    UvicornWorker = None
+
+if UvicornWorker is not None:
+    class ProductionWorker(UvicornWorker):
+        """Uvicorn worker for gunicorn using this module's loop, HTTP and shutdown settings"""
+        CONFIG_KWARGS = {
+            "loop": SERVER_LOOP,
+            "http": SERVER_HTTP,
+            "timeout_graceful_shutdown": GRACEFUL_TIMEOUT_SECONDS,
+        }
+
+def check_worker_settings():
+    """Turn off per-process state that would serve stale data across several workers"""
+    if WORKERS <= 1:
+        return
+    if RESPONSE_CACHE_BACKEND == "memory":
+        logger.warning(
+            "WORKERS=%d with RESPONSE_CACHE_BACKEND=memory would serve stale students from other "
+            "workers after a write; the response cache is disabled. Set RESPONSE_CACHE_BACKEND=redis "
+            "to cache with several workers.", WORKERS
+        )
+        # Read by response_cache at import, in this process and in every worker
+        os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+    if os.getenv("DB_REPLICA_URLS"):
+        logger.warning(
+            "Read-your-writes replica pins are per worker; with WORKERS=%d a read on another worker "
+            "than the write can come from a replica that is behind.", WORKERS
+        )
+
+def prepare_database():
+    """Check (or with AUTO_MIGRATE, upgrade) the schema once, before any worker starts"""
+    import models
+    from migrations import check_schema
+
+    check_schema()
+    # Forked workers must not inherit the master's pooled connections
+    models.engine.dispose()
+
+def run_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    class ProductionApplication(BaseApplication):
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    ProductionApplication({
+        "bind": f"{HOST}:{PORT}",
+        "workers": WORKERS,
+        "worker_class": "serve.ProductionWorker",
+        "preload_app": True,
+        "keepalive": KEEPALIVE_SECONDS,
+        "backlog": BACKLOG,
+        "graceful_timeout": GRACEFUL_TIMEOUT_SECONDS,
+        "timeout": WORKER_TIMEOUT_SECONDS,
+        "max_requests": MAX_REQUESTS,
+        "max_requests_jitter": MAX_REQUESTS // 10,
+        "forwarded_allow_ips": FORWARDED_ALLOW_IPS,
+        "accesslog": "-" if SERVER_ACCESS_LOG else None,
+    }).run()
+
+def run_uvicorn():
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        loop=SERVER_LOOP,
+        http=SERVER_HTTP,
+        backlog=BACKLOG,
+        timeout_keep_alive=KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT_SECONDS,
+        limit_max_requests=MAX_REQUESTS or None,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        access_log=SERVER_ACCESS_LOG,
+    )
+
+def main():
+    check_worker_settings()
+    prepare_database()
+    if UvicornWorker is not None:
+        run_gunicorn()
+    else:
+        run_uvicorn()
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ Run this script to initialize the database with sample data
 """
 
 from sqlalchemy.orm import sessionmaker
-from models import engine, Teacher, Student, Mark
+from models import engine, Teacher, Student, Mark, rebuild_semester_summaries
+from migrations import migrate
 from auth import get_password_hash
 import logging
 
@@ -133,6 +134,7 @@ def create_sample_data():
                     db.add(mark)
         
         db.commit()
+        rebuild_semester_summaries()
         logger.info("Sample data created successfully!")
         
         # Print login credentials
@@ -161,4 +163,5 @@ def create_sample_data():
         db.close()
 
 if __name__ == "__main__":
+    migrate()
     create_sample_data()
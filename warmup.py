@@ -0,0 +1,75 @@
+"""
+Startup Warm-up
+Optionally prepare templates and caches right after the app starts.
+
+The warm-up runs as a background task once startup has finished, so the
+first requests are served straight away instead of waiting for it:
+    - WARM_TEMPLATES (default True) compiles every template, in a thread
+    - WARM_STUDENT_COUNT students (default 0 = off) from the most recent
+      admission years, the cohorts whose marks are being entered and viewed,
+      get their identifiers and student / marks responses cached
+
+Each worker warms its own in-memory caches. Keep WARM_STUDENT_COUNT within
+what the caches hold: three identifiers per student in the identifier cache
+(STUDENT_ID_CACHE_SIZE) and two entries in the response cache
+(RESPONSE_CACHE_SIZE), or the warm-up evicts its own entries.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+import anyio
+from sqlalchemy import select
+
+from models import read_session, student_identifier_cache, Student
+from rendering import warm_templates
+from response_cache import response_cache
+
+WARM_TEMPLATES = os.getenv("WARM_TEMPLATES", "True").lower() == "true"
+WARM_STUDENT_COUNT = int(os.getenv("WARM_STUDENT_COUNT", "0"))
+WARM_BATCH_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+async def warm_students(count: int = WARM_STUDENT_COUNT) -> int:
+    """
+    Cache identifiers and student / marks responses of the `count` most recently admitted students.
+
+    Returns:
+        Number of responses rendered (entries that were already cached are skipped)
+    """
+    from routes import student_body, student_marks_body
+
+    rendered = 0
+    async with read_session() as db:
+        students = (await db.scalars(
+            select(Student)
+            .order_by(Student.admission_year.desc(), Student.reg_no.desc())
+            .limit(count)
+        )).all()
+        for start in range(0, len(students), WARM_BATCH_SIZE):
+            for student in students[start:start + WARM_BATCH_SIZE]:
+                for identifier in (student.reg_no, student.umis_id, student.emis_id):
+                    student_identifier_cache.set(identifier, student.reg_no)
+                # The student is already in the session, so only the marks are queried
+                rendered += await response_cache.warm("student", student.reg_no, lambda: student_body(db, student.reg_no))
+                rendered += await response_cache.warm("marks", student.reg_no, lambda: student_marks_body(db, student.reg_no))
+            # Let requests that arrive meanwhile run between batches
+            await asyncio.sleep(0)
+    return rendered
+
+async def warm_up():
+    """Background warm-up started by the app's lifespan; failures are logged, never raised"""
+    start = time.perf_counter()
+    try:
+        if WARM_TEMPLATES:
+            await anyio.to_thread.run_sync(warm_templates)
+        rendered = await warm_students() if WARM_STUDENT_COUNT else 0
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Startup warm-up failed")
+        return
+    logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s ({rendered} responses cached)")